@@ -1,608 +1,2655 @@
-# Fireworks12g.scr - ID/Error - Matthew Carven - Google Gemini
-# Simplified AFK Logic:
-# - Removed Wall Drift/Edge Detection.
-# - Added AFK Teleport: If mouse is static for 30s, it teleports to a random spot.
-# - Safe Timer & Kill Streak only reset on PHYSICAL HITS.
-
-import pygame
-import random
-import math
-import sys
-import ctypes
-import json
-import os
-import tkinter as tk
-from tkinter import messagebox
-
-# --- Configuration Paths ---
-CONFIG_DIR = r"C:\screensaverconfigs"
-CONFIG_FILE = "fireworks_config4g.json"
-CONFIG_PATH = os.path.join(CONFIG_DIR, CONFIG_FILE)
-
-DEFAULT_CONFIG = {
-    "gravity": 0.05,
-    "wind": 0,
-    "cursor_pusher_enabled": True,
-    "trail_length": 40,
-    "pusher_force": 1000,
-    "sparks_chaser": 200,
-    "sparks_rocket": 100,
-    "punishment_mode": False,
-    "high_score_time": 0.0,
-    "high_score_chasers": 0
-}
-
-# --- Global Game State ---
-LAST_HIT_TIME = 0
-CHASER_SCORE = 0
-
-def load_config():
-    try:
-        with open(CONFIG_PATH, 'r') as f:
-            data = json.load(f)
-            for key, value in DEFAULT_CONFIG.items():
-                if key not in data:
-                    data[key] = value
-            return data
-    except (FileNotFoundError, json.JSONDecodeError):
-        return DEFAULT_CONFIG
-
-def save_config(config_data):
-    try:
-        if not os.path.exists(CONFIG_DIR):
-            os.makedirs(CONFIG_DIR)
-        with open(CONFIG_PATH, 'w') as f:
-            json.dump(config_data, f, indent=4)
-    except PermissionError:
-        pass 
-    except Exception as e:
-        print(f"Save error: {e}")
-
-# --- Helper to Update High Scores ---
-def check_and_save_high_scores():
-    global LAST_HIT_TIME, CHASER_SCORE, active_config
-    
-    current_duration = (pygame.time.get_ticks() - LAST_HIT_TIME) / 1000.0
-    changed = False
-    
-    # Check Time
-    if current_duration > active_config["high_score_time"]:
-        active_config["high_score_time"] = round(current_duration, 1)
-        changed = True
-        
-    # Check Kills
-    if CHASER_SCORE > active_config["high_score_chasers"]:
-        active_config["high_score_chasers"] = CHASER_SCORE
-        changed = True
-        
-    if changed:
-        save_config(active_config)
-
-
-def open_settings_window():
-    current_config = load_config()
-    root = tk.Tk()
-    root.title("Fireworks Settings")
-    root.geometry("400x550") 
-    
-    gravity_var = tk.DoubleVar(value=current_config.get("gravity", 0.05))
-    wind_var = tk.IntVar(value=current_config.get("wind", 0))
-    pusher_var = tk.BooleanVar(value=current_config.get("cursor_pusher_enabled", True))
-    trail_var = tk.IntVar(value=current_config.get("trail_length", 60))
-    force_var = tk.IntVar(value=current_config.get("pusher_force", 3000))
-    chaser_sparks_var = tk.IntVar(value=current_config.get("sparks_chaser", 200))
-    rocket_sparks_var = tk.IntVar(value=current_config.get("sparks_rocket", 100))
-    punish_var = tk.BooleanVar(value=current_config.get("punishment_mode", False))
-
-    tk.Label(root, text="Gravity (0.01 - 0.2):").pack(pady=2)
-    tk.Scale(root, variable=gravity_var, from_=0.01, to=0.2, resolution=0.01, orient=tk.HORIZONTAL, length=300).pack()
-    tk.Label(root, text="Wind (-5 to 5):").pack(pady=2)
-    tk.Scale(root, variable=wind_var, from_=-5, to=5, orient=tk.HORIZONTAL, length=300).pack()
-    tk.Label(root, text="Pusher Force (1000 - 10000):").pack(pady=2)
-    tk.Scale(root, variable=force_var, from_=1000, to=10000, resolution=100, orient=tk.HORIZONTAL, length=300).pack()
-    tk.Label(root, text="Max Sparks (Chaser):").pack(pady=2)
-    tk.Scale(root, variable=chaser_sparks_var, from_=50, to=500, orient=tk.HORIZONTAL, length=300).pack()
-    tk.Label(root, text="Max Sparks (Standard):").pack(pady=2)
-    tk.Scale(root, variable=rocket_sparks_var, from_=10, to=300, orient=tk.HORIZONTAL, length=300).pack()
-    
-    tk.Checkbutton(root, text="Enable Cursor Pushers (Unruly Mode)", variable=pusher_var).pack(pady=5)
-    tk.Checkbutton(root, text="Punishment Mode (All Explosions Push)", variable=punish_var, fg="red").pack(pady=5)
-    
-    best_time = current_config.get("high_score_time", 0)
-    best_kills = current_config.get("high_score_chasers", 0)
-    tk.Label(root, text=f"Best Time: {best_time}s | Best Kills: {best_kills}", font=("Arial", 10, "bold"), fg="blue").pack(pady=10)
-    
-    tk.Label(root, text=f"Config location: {CONFIG_PATH}", font=("Arial", 8), fg="gray").pack(pady=5)
-
-    def on_save():
-        new_config = {
-            "gravity": round(gravity_var.get(), 3),
-            "wind": wind_var.get(),
-            "cursor_pusher_enabled": pusher_var.get(),
-            "trail_length": trail_var.get(),
-            "pusher_force": force_var.get(),
-            "sparks_chaser": chaser_sparks_var.get(),
-            "sparks_rocket": rocket_sparks_var.get(),
-            "punishment_mode": punish_var.get(),
-            "high_score_time": best_time,       
-            "high_score_chasers": best_kills
-        }
-        save_config(new_config)
-        messagebox.showinfo("Saved", f"Settings saved to:\n{CONFIG_PATH}")
-        root.destroy()
-
-    tk.Button(root, text="Save & Close", command=on_save, height=2, width=20).pack(pady=5)
-    root.mainloop()
-
-# --- 1. Windows Screensaver Argument Handling ---
-if len(sys.argv) > 1:
-    arg = sys.argv[1].lower()
-    if "/p" in arg: pass 
-    if "/c" in arg: 
-        open_settings_window()
-        sys.exit()
-    if "/s" in arg: pass
-
-# --- 2. Load Config & Init ---
-active_config = load_config()
-
-#pygame.init()
-pygame.font.init()
-pygame.display.init()
-
-
-screen_info = pygame.display.Info()
-WIDTH = screen_info.current_w
-HEIGHT = screen_info.current_h
-
-screen = pygame.display.set_mode((WIDTH, HEIGHT), pygame.FULLSCREEN)
-pygame.display.set_caption("Fireworks Screensaver")
-clock = pygame.time.Clock()
-font = pygame.font.SysFont("Arial", 24)
-timer_font = pygame.font.SysFont("Consolas", 32, bold=True)
-score_font = pygame.font.SysFont("Consolas", 32, bold=True)
-small_font = pygame.font.SysFont("Consolas", 18)
-FPS = 60
-BLACK = (0, 0, 0)
-
-# Apply Config
-GRAVITY = active_config.get("gravity", 0.05)
-WIND = active_config.get("wind", 0)
-PUSHER_ENABLED = active_config.get("cursor_pusher_enabled", True)
-TRAIL_ALPHA = active_config.get("trail_length", 60)
-PUSHER_FORCE = active_config.get("pusher_force", 1000)
-SPARKS_CHASER_MAX = active_config.get("sparks_chaser", 200)
-SPARKS_ROCKET_MAX = active_config.get("sparks_rocket", 100)
-PUNISHMENT_MODE = active_config.get("punishment_mode", False)
-
-TYPE_ROCKET = 0
-TYPE_SPARK = 1
-TYPE_CHASER = 2 
-TYPE_CLUSTER = 3
-TYPE_TRAIL = 4 
-TYPE_CURSOR_PUSHER = 5 
-
-def random_color():
-    c = [random.randint(50, 255), random.randint(50, 255), random.randint(50, 255)]
-    c[random.randint(0, 2)] = 255
-    return c
-
-# --- Classes ---
-
-class Particle:
-    def __init__(self, x, y, color, p_type, vx=0, vy=0, source_type=None):
-        self.x = x
-        self.y = y
-        self.color = list(color) 
-        self.p_type = p_type
-        self.alive = True
-        self.vx = vx
-        self.vy = vy
-        self.source_type = source_type 
-        
-        if self.p_type == TYPE_SPARK or self.p_type == TYPE_TRAIL:
-            if self.vx == 0 and self.vy == 0:
-                angle = random.uniform(0, 2 * math.pi)
-                speed = random.uniform(2, 12)
-                self.vx = math.cos(angle) * speed
-                self.vy = math.sin(angle) * speed
-            self.radius = random.randint(2, 4)
-            self.decay = random.uniform(0.02, 0.05) 
-            
-        elif self.p_type == TYPE_CHASER:
-            self.radius = 6
-            self.decay = 0
-            self.fuel = random.randint(600, 900)
-            self.max_speed = random.uniform(8, 21) 
-
-        elif self.p_type == TYPE_CURSOR_PUSHER:
-            self.radius = 0 
-            self.decay = 0
-            self.life = 60 
-            
-        else: 
-            self.radius = 4
-            self.decay = 0
-
-    def move(self):
-        global LAST_HIT_TIME, CHASER_SCORE
-
-        # Gravity
-        if self.p_type != TYPE_CHASER and self.p_type != TYPE_CURSOR_PUSHER:
-            self.vy += GRAVITY
-        
-        # Type Specific Logic
-        if self.p_type == TYPE_SPARK:
-            self.vx += WIND * 0.02
-            self.vx *= 0.92 
-            self.vy *= 0.92 
-            self.color[0] = max(0, self.color[0] * 0.99)
-            self.color[1] = max(0, self.color[1] * 0.99)
-            self.color[2] = max(0, self.color[2] * 0.99)
-            self.radius -= self.decay
-            if self.radius <= 0 or sum(self.color) < 10:
-                self.alive = False
-
-        elif self.p_type == TYPE_TRAIL:
-            self.vx += WIND * 0.02
-            self.vx *= 0.96 
-            self.vy *= 0.96 
-            self.color[0] = max(0, self.color[0] * 0.98)
-            self.color[1] = max(0, self.color[1] * 0.98)
-            self.color[2] = max(0, self.color[2] * 0.98)
-            self.radius -= self.decay
-            if self.radius <= 0 or sum(self.color) < 10:
-                self.alive = False
-
-        elif self.p_type == TYPE_CHASER:
-            mx, my = pygame.mouse.get_pos()
-            dx = mx - self.x
-            dy = my - self.y
-            angle = math.atan2(dy, dx)
-            
-            thrust_power = 0.4 
-            self.vx += math.cos(angle) * thrust_power
-            self.vy += math.sin(angle) * thrust_power
-            
-            current_speed = math.hypot(self.vx, self.vy)
-            if current_speed > self.max_speed:
-                scale = self.max_speed / current_speed
-                self.vx *= scale
-                self.vy *= scale
-            
-            self.fuel -= 1 
-            if self.fuel < 100 and random.randint(0, 10) == 0:
-                 self.vx *= 0.9
-                 self.vy *= 0.9
-
-        elif self.p_type == TYPE_CURSOR_PUSHER:
-            mx, my = pygame.mouse.get_pos()
-            new_mx = mx + self.vx
-            new_my = my + self.vy
-            
-            # Bound checking
-            new_mx = max(0, min(WIDTH, new_mx))
-            new_my = max(0, min(HEIGHT, new_my))
-            
-            # --- HIT REGISTRATION ---
-            force_applied = math.hypot(self.vx, self.vy)
-            HIT_THRESHOLD = 3.0 
-            
-            if force_applied > 0:
-                 pygame.mouse.set_pos(new_mx, new_my)
-
-            if force_applied > HIT_THRESHOLD:
-                # 1. SAVE HIGH SCORES BEFORE RESETTING
-                check_and_save_high_scores()
-                
-                # 2. ALWAYS RESET TIMER ON PHYSICAL HIT
-                LAST_HIT_TIME = pygame.time.get_ticks()
-
-                # 3. RESET SCORE (Only if Chaser)
-                if self.source_type == TYPE_CHASER:
-                    CHASER_SCORE = 0
-
-            self.vx *= 0.9
-            self.vy *= 0.9
-            if abs(self.vx) < 0.1 and abs(self.vy) < 0.1:
-                self.alive = False
-        
-        if self.p_type != TYPE_CURSOR_PUSHER:
-            self.x += self.vx
-            self.y += self.vy
-
-    def draw(self, surface):
-        if self.alive and self.radius > 0:
-            draw_color = (int(self.color[0]), int(self.color[1]), int(self.color[2]))
-            pygame.draw.circle(surface, draw_color, (int(self.x), int(self.y)), int(self.radius))
-
-
-class Firework:
-    def __init__(self, x=None, y=None, p_type=TYPE_ROCKET):
-        self.color = random_color()
-        self.particles = []
-        self.exploded = False
-        self.p_type = p_type
-        
-        if self.p_type == TYPE_CLUSTER:
-            self.fuse = random.randint(20, 50)
-            self.is_special = False
-            angle = random.uniform(math.pi + 0.5, 2 * math.pi - 0.5) 
-            speed = random.uniform(6, 14)
-            vx = math.cos(angle) * speed
-            vy = math.sin(angle) * speed
-            self.rocket = Particle(x, y, self.color, TYPE_CLUSTER, vx=vx, vy=vy)
-            
-        elif self.p_type == TYPE_CHASER:
-            self.fuse = 99999 
-            self.is_special = (random.randint(1, 25) == 1) # 4% Chance
-            
-            if x is not None and y is not None:
-                start_x, start_y = x, y
-                angle = random.uniform(0, 2 * math.pi)
-                speed = random.uniform(6, 15) 
-                start_vx = math.cos(angle) * speed
-                start_vy = math.sin(angle) * speed
-            else:
-                start_vx = 0
-                start_vy = 0
-                side = random.randint(0, 3)
-                if side == 0: 
-                    start_x = random.randint(0, WIDTH)
-                    start_y = -10
-                elif side == 1: 
-                    start_x = random.randint(0, WIDTH)
-                    start_y = HEIGHT + 10
-                elif side == 2: 
-                    start_x = -10
-                    start_y = random.randint(0, HEIGHT)
-                elif side == 3: 
-                    start_x = WIDTH + 10
-                    start_y = random.randint(0, HEIGHT)
-
-            self.rocket = Particle(start_x, start_y, self.color, TYPE_CHASER, vx=start_vx, vy=start_vy)
-            
-        else:
-            self.fuse = random.randint(30, 70)
-            self.is_special = (random.randint(1, 5) == 1)
-            start_x = random.randint(100, WIDTH - 100)
-            start_y = HEIGHT
-            launch_power = -1 * ((HEIGHT / 3) / 45) - random.uniform(3, 6)
-            start_vx = random.uniform(-1, 1)
-            self.rocket = Particle(start_x, start_y, self.color, TYPE_ROCKET, vx=start_vx, vy=launch_power)
-
-        self.age = 0
-
-    def update(self):
-        new_borns = []
-        
-        if not self.exploded:
-            self.rocket.move()
-            self.age += 1
-            
-            if self.p_type == TYPE_CHASER:
-                if self.age % 2 == 0: 
-                    trail_spark = Particle(self.rocket.x, self.rocket.y, self.color, TYPE_TRAIL)
-                    trail_spark.vx = random.uniform(-1, 1)
-                    trail_spark.vy = random.uniform(0, 2)
-                    self.particles.append(trail_spark)
-
-                mx, my = pygame.mouse.get_pos()
-                dist_to_mouse = math.hypot(mx - self.rocket.x, my - self.rocket.y)
-                
-                # Minimum Flight Time Check
-                if self.rocket.fuel <= 0 or (dist_to_mouse < 30 and self.age > 30):
-                    new_borns = self.explode()
-            else:
-                if self.age >= self.fuse or self.rocket.y > HEIGHT:
-                    new_borns = self.explode()
-
-        for particle in self.particles:
-            particle.move()
-            
-        self.particles = [p for p in self.particles if p.alive]
-        
-        return new_borns
-
-    def explode(self):
-        global CHASER_SCORE
-        self.exploded = True
-        new_fireworks = []
-        
-        if self.is_special and self.p_type == TYPE_ROCKET:
-            amount = random.randint(8, 15)
-            for _ in range(amount):
-                baby = Firework(self.rocket.x, self.rocket.y, p_type=TYPE_CLUSTER)
-                new_fireworks.append(baby)
-        else:
-            mx, my = pygame.mouse.get_pos()
-            dx = mx - self.rocket.x
-            dy = my - self.rocket.y
-            dist = math.hypot(dx, dy)
-            if dist < 1: dist = 1
-            dir_x = dx / dist
-            dir_y = dy / dist
-            
-            def create_pusher():
-                force = PUSHER_FORCE
-                if self.p_type == TYPE_CLUSTER:
-                    force = force / 5
-                
-                force_magnitude = force / (dist + 20)
-                push_vx = dir_x * force_magnitude
-                push_vy = dir_y * force_magnitude
-                return Particle(0, 0, self.color, TYPE_CURSOR_PUSHER, vx=push_vx, vy=push_vy, source_type=self.p_type)
-
-            if self.p_type == TYPE_CHASER:
-                # INCREMENT SCORE
-                CHASER_SCORE += 1
-                
-                if self.is_special:
-                    for _ in range(3):
-                        new_fireworks.append(Firework(self.rocket.x, self.rocket.y, p_type=TYPE_CHASER))
-
-                if PUSHER_ENABLED:
-                    self.particles.append(create_pusher())
-                
-                amount = random.randint(SPARKS_CHASER_MAX // 2, SPARKS_CHASER_MAX)
-                for _ in range(amount):
-                    p = Particle(self.rocket.x, self.rocket.y, self.color, TYPE_SPARK)
-                    self.particles.append(p)
-
-            else:
-                amount = random.randint(SPARKS_ROCKET_MAX // 2, SPARKS_ROCKET_MAX)
-                if PUNISHMENT_MODE and PUSHER_ENABLED:
-                    self.particles.append(create_pusher())
-
-            for _ in range(amount):
-                p = Particle(self.rocket.x, self.rocket.y, self.color, TYPE_SPARK)
-                self.particles.append(p)
-                
-        return new_fireworks
-
-    def draw(self, surface):
-        if not self.exploded:
-            self.rocket.draw(surface)
-        
-        for particle in self.particles:
-            particle.draw(surface)
-
-    def is_finished(self):
-        return self.exploded and len(self.particles) == 0
-
-# --- Main Loop ---
-
-def main():
-    global WIND
-    global LAST_HIT_TIME, CHASER_SCORE
-    
-    fireworks = []
-
-    
-    # Init Mouse State for AFK Tracking
-    last_mouse_pos = pygame.mouse.get_pos()
-    last_move_time = pygame.time.get_ticks()
-    
-    LAST_HIT_TIME = pygame.time.get_ticks()
-
-    running = True
-    while running:
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                check_and_save_high_scores() 
-                running = False
-            
-            if event.type == pygame.MOUSEBUTTONDOWN:
-                check_and_save_high_scores() 
-                running = False
-                
-            if event.type == pygame.KEYDOWN:
-                if event.key in [pygame.K_q, pygame.K_ESCAPE]:
-                    check_and_save_high_scores() 
-                    running = False
-                
-                if event.key == pygame.K_SPACE:
-                    fireworks.append(Firework(p_type=TYPE_ROCKET))
-                if event.key == pygame.K_c:
-                    fireworks.append(Firework(p_type=TYPE_CHASER))
-                if event.key == pygame.K_BACKSLASH:
-                    for _ in range(10): fireworks.append(Firework(p_type=TYPE_ROCKET))
-                if event.key == pygame.K_F12:
-                    for _ in range(30): fireworks.append(Firework(p_type=TYPE_ROCKET))
-                
-                if event.key == pygame.K_RIGHT:
-                    WIND += 1
-                if event.key == pygame.K_LEFT:
-                    WIND -= 1
-
-        # --- AFK / IDLE LOGIC ---
-        mx, my = pygame.mouse.get_pos()
-        dist_moved = math.hypot(mx - last_mouse_pos[0], my - last_mouse_pos[1])
-        
-        # If moved significantly (>3px), reset idle timer
-        if dist_moved > 3:
-            last_mouse_pos = (mx, my)
-            last_move_time = pygame.time.get_ticks()
-            
-        # Check if idle for > 30 seconds
-        if pygame.time.get_ticks() - last_move_time > 30000:
-            # Teleport!
-            new_x = random.randint(50, WIDTH - 50)
-            new_y = random.randint(50, HEIGHT - 50)
-            pygame.mouse.set_pos(new_x, new_y)
-            
-            # Reset trackers to the new position so we don't loop teleport
-            last_mouse_pos = (new_x, new_y)
-            last_move_time = pygame.time.get_ticks()
-
-        # Auto-launch
-        if random.randint(1, 30) == 1:
-            if random.randint(1, 10) == 1:
-                fireworks.append(Firework(p_type=TYPE_CHASER))
-            else:
-                fireworks.append(Firework(p_type=TYPE_ROCKET))
-
-        current_fireworks = fireworks[:] 
-        new_additions = []
-        for fw in current_fireworks:
-            babies = fw.update()
-            if babies:
-                new_additions.extend(babies)
-        fireworks.extend(new_additions)
-        fireworks = [fw for fw in fireworks if not fw.is_finished()]
-
-        # Draw Trail
-        trail_surface = pygame.Surface((WIDTH, HEIGHT))
-        trail_surface.set_alpha(TRAIL_ALPHA) 
-        trail_surface.fill(BLACK)
-        screen.blit(trail_surface, (0, 0))
-
-        for fw in fireworks:
-            fw.draw(screen)
-
-        # --- UI OVERLAYS ---
-        
-        # 1. Wind
-        if WIND != 0:
-            wind_text = f"Wind: {WIND}"
-            text_surface = font.render(wind_text, True, (255, 255, 255))
-            screen.blit(text_surface, (20, 20))
-
-        # 2. Survival Timer & Score (Not in Punishment Mode)
-        if not PUNISHMENT_MODE:
-            current_time = pygame.time.get_ticks()
-            elapsed_seconds = (current_time - LAST_HIT_TIME) / 1000.0
-            
-            # Show timer if safe for > 30s
-            if elapsed_seconds > 30:
-                time_str = f"Safe Time: {elapsed_seconds:.1f}s"
-                time_surf = timer_font.render(time_str, True, (0, 255, 0)) # Green text
-                screen.blit(time_surf, (WIDTH - time_surf.get_width() - 20, 20))
-                
-                # Show Best Time
-                best_time = active_config.get("high_score_time", 0.0)
-                best_time_str = f"Best: {best_time}s"
-                best_time_surf = small_font.render(best_time_str, True, (100, 100, 100))
-                screen.blit(best_time_surf, (WIDTH - best_time_surf.get_width() - 20, 55))
-            
-            # Show score if > 0
-            if CHASER_SCORE > 0:
-                score_str = f"Chasers Survived: {CHASER_SCORE}"
-                score_surf = score_font.render(score_str, True, (255, 50, 50)) # Red text
-                
-                y_pos = 80 if elapsed_seconds > 30 else 20
-                screen.blit(score_surf, (WIDTH - score_surf.get_width() - 20, y_pos))
-                
-                # Show Best Score
-                best_score = active_config.get("high_score_chasers", 0)
-                best_score_str = f"Best: {best_score}"
-                best_score_surf = small_font.render(best_score_str, True, (100, 100, 100))
-                screen.blit(best_score_surf, (WIDTH - best_score_surf.get_width() - 20, y_pos + 35))
-
-        pygame.display.flip()
-        clock.tick(FPS)
-
-    pygame.quit()
-
-if __name__ == "__main__":
-    main()
\ No newline at end of file
+# Fireworks12g.scr - ID/Error - Matthew Carven - Google Gemini
+# Simplified AFK Logic:
+# - Removed Wall Drift/Edge Detection.
+# - Added AFK Teleport: If mouse is static for 30s, it teleports to a random spot.
+# - Safe Timer & Kill Streak only reset on PHYSICAL HITS.
+
+import time
+STARTUP_T0 = time.perf_counter()
+
+import sys
+import os
+
+# A frozen build re-runs this file for each worker process; divert those
+# before anything below opens a display.
+if getattr(sys, "frozen", False):
+    import multiprocessing
+    multiprocessing.freeze_support()
+
+import pygame
+import random
+import math
+import ctypes
+import json
+import itertools
+import threading
+import struct
+import zlib
+from collections import OrderedDict, deque
+import numpy as np
+# tkinter (settings dialog), argparse (/bench) and multiprocessing (sim
+# workers) are imported where they're used so /s doesn't pay for them.
+
+startup_marks = []
+
+def mark_startup(stage):
+    startup_marks.append((stage, (time.perf_counter() - STARTUP_T0) * 1000.0))
+
+def save_startup_report():
+    report = json.dumps(startup_report(), indent=4)
+    print(report)
+    try:
+        if not os.path.exists(CONFIG_DIR):
+            os.makedirs(CONFIG_DIR)
+        with open(os.path.join(CONFIG_DIR, "startup_timing.json"), 'w') as f:
+            f.write(report)
+    except OSError:
+        pass
+
+def startup_report():
+    report = {}
+    previous = 0.0
+    for stage, at_ms in startup_marks:
+        report[stage] = {"at_ms": round(at_ms, 2), "took_ms": round(at_ms - previous, 2)}
+        previous = at_ms
+    return report
+
+mark_startup("imports")
+
+# --- Configuration Paths ---
+CONFIG_DIR = r"C:\screensaverconfigs"
+CONFIG_FILE = "fireworks_config4g.json"
+CONFIG_PATH = os.path.join(CONFIG_DIR, CONFIG_FILE)
+
+DEFAULT_CONFIG = {
+    "gravity": 0.05,
+    "wind": 0,
+    "cursor_pusher_enabled": True,
+    "trail_length": 40,
+    "pusher_force": 1000,
+    "sparks_chaser": 200,
+    "sparks_rocket": 100,
+    "punishment_mode": False,
+    "high_score_time": 0.0,
+    "high_score_chasers": 0,
+    "particle_pool_size": 20000,
+    "particle_pool_policy": "drop_dimmest",
+    "max_fireworks": 300,
+    "render_mode": "flip",
+    "sprite_cache_size": 2048,
+    "max_fps": 60,
+    "adaptive_quality": True,
+    "target_frame_ms": 14.0,
+    "show_quality_overlay": False,
+    "sim_workers": 0,
+    "startup_report": False,
+    "profiler_history": 600,
+    "burst_shapes": ["sphere"],
+    "record_session": False,
+    "render_tiles": 0,
+    "render_scale": 1.0,
+    "render_smooth": False,
+    "spark_style": "flat",
+    "trail_fade": "blit",
+    "trail_fade_bounds": False
+}
+
+def load_config():
+    try:
+        with open(CONFIG_PATH, 'r') as f:
+            data = json.load(f)
+            for key, value in DEFAULT_CONFIG.items():
+                if key not in data:
+                    data[key] = value
+            return data
+    except (FileNotFoundError, json.JSONDecodeError):
+        return DEFAULT_CONFIG
+
+def save_config(config_data):
+    # Write to a temp file and rename over the old one so a crash mid-write
+    # never leaves a truncated config behind
+    tmp_path = CONFIG_PATH + ".tmp"
+    try:
+        if not os.path.exists(CONFIG_DIR):
+            os.makedirs(CONFIG_DIR)
+        with open(tmp_path, 'w') as f:
+            json.dump(config_data, f, indent=4)
+        os.replace(tmp_path, CONFIG_PATH)
+    except PermissionError:
+        pass 
+    except Exception as e:
+        print(f"Save error: {e}")
+
+class ConfigWriter:
+    """Saves the config on a background thread so the game loop never
+    waits on disk.
+
+    submit() just stores a snapshot. The thread waits COALESCE_SECONDS after
+    the first one, so a burst of hits during a chaser storm becomes a single
+    write of the latest values. close() flushes whatever is pending."""
+
+    COALESCE_SECONDS = 0.5
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.stopping = threading.Event()
+        self.pending = None
+        self.thread = None
+
+    def submit(self, config_data):
+        with self.lock:
+            self.pending = dict(config_data)
+        if self.thread is None:
+            self.thread = threading.Thread(target=self._run, name="config-writer", daemon=True)
+            self.thread.start()
+        self.wakeup.set()
+
+    def _run(self):
+        while True:
+            self.wakeup.wait()
+            # Returns early when close() is flushing
+            self.stopping.wait(self.COALESCE_SECONDS)
+            self.wakeup.clear()
+            with self.lock:
+                data, self.pending = self.pending, None
+            if data is not None:
+                save_config(data)
+            if self.stopping.is_set():
+                # A submit() that landed during the write still gets saved
+                with self.lock:
+                    if self.pending is None:
+                        return
+
+    def close(self):
+        if self.thread is None:
+            return
+        self.stopping.set()
+        self.wakeup.set()
+        self.thread.join()
+        self.thread = None
+
+config_writer = ConfigWriter()
+
+# --- Helper to Update High Scores ---
+def check_and_save_high_scores(world):
+    global active_config
+    
+    current_duration = (pygame.time.get_ticks() - world.last_hit_time) / 1000.0
+    changed = False
+    
+    # Check Time
+    if current_duration > active_config["high_score_time"]:
+        active_config["high_score_time"] = round(current_duration, 1)
+        changed = True
+        
+    # Check Kills
+    if world.chaser_score > active_config["high_score_chasers"]:
+        active_config["high_score_chasers"] = world.chaser_score
+        changed = True
+        
+    if changed and not (BENCHMARK_MODE or REPLAY_MODE):
+        config_writer.submit(active_config)
+
+
+def open_settings_window():
+    import tkinter as tk
+    from tkinter import messagebox
+
+    current_config = load_config()
+    root = tk.Tk()
+    root.title("Fireworks Settings")
+    root.geometry("400x550") 
+    
+    gravity_var = tk.DoubleVar(value=current_config.get("gravity", 0.05))
+    wind_var = tk.IntVar(value=current_config.get("wind", 0))
+    pusher_var = tk.BooleanVar(value=current_config.get("cursor_pusher_enabled", True))
+    trail_var = tk.IntVar(value=current_config.get("trail_length", 60))
+    force_var = tk.IntVar(value=current_config.get("pusher_force", 3000))
+    chaser_sparks_var = tk.IntVar(value=current_config.get("sparks_chaser", 200))
+    rocket_sparks_var = tk.IntVar(value=current_config.get("sparks_rocket", 100))
+    punish_var = tk.BooleanVar(value=current_config.get("punishment_mode", False))
+
+    tk.Label(root, text="Gravity (0.01 - 0.2):").pack(pady=2)
+    tk.Scale(root, variable=gravity_var, from_=0.01, to=0.2, resolution=0.01, orient=tk.HORIZONTAL, length=300).pack()
+    tk.Label(root, text="Wind (-5 to 5):").pack(pady=2)
+    tk.Scale(root, variable=wind_var, from_=-5, to=5, orient=tk.HORIZONTAL, length=300).pack()
+    tk.Label(root, text="Pusher Force (1000 - 10000):").pack(pady=2)
+    tk.Scale(root, variable=force_var, from_=1000, to=10000, resolution=100, orient=tk.HORIZONTAL, length=300).pack()
+    tk.Label(root, text="Max Sparks (Chaser):").pack(pady=2)
+    tk.Scale(root, variable=chaser_sparks_var, from_=50, to=500, orient=tk.HORIZONTAL, length=300).pack()
+    tk.Label(root, text="Max Sparks (Standard):").pack(pady=2)
+    tk.Scale(root, variable=rocket_sparks_var, from_=10, to=300, orient=tk.HORIZONTAL, length=300).pack()
+    
+    tk.Checkbutton(root, text="Enable Cursor Pushers (Unruly Mode)", variable=pusher_var).pack(pady=5)
+    tk.Checkbutton(root, text="Punishment Mode (All Explosions Push)", variable=punish_var, fg="red").pack(pady=5)
+    
+    best_time = current_config.get("high_score_time", 0)
+    best_kills = current_config.get("high_score_chasers", 0)
+    tk.Label(root, text=f"Best Time: {best_time}s | Best Kills: {best_kills}", font=("Arial", 10, "bold"), fg="blue").pack(pady=10)
+    
+    tk.Label(root, text=f"Config location: {CONFIG_PATH}", font=("Arial", 8), fg="gray").pack(pady=5)
+
+    def on_save():
+        # Start from the loaded file so keys without a widget (pool size etc.) survive
+        new_config = dict(current_config)
+        new_config.update({
+            "gravity": round(gravity_var.get(), 3),
+            "wind": wind_var.get(),
+            "cursor_pusher_enabled": pusher_var.get(),
+            "trail_length": trail_var.get(),
+            "pusher_force": force_var.get(),
+            "sparks_chaser": chaser_sparks_var.get(),
+            "sparks_rocket": rocket_sparks_var.get(),
+            "punishment_mode": punish_var.get(),
+            "high_score_time": best_time,       
+            "high_score_chasers": best_kills
+        })
+        save_config(new_config)
+        messagebox.showinfo("Saved", f"Settings saved to:\n{CONFIG_PATH}")
+        root.destroy()
+
+    tk.Button(root, text="Save & Close", command=on_save, height=2, width=20).pack(pady=5)
+    root.mainloop()
+
+BENCHMARK_SCENARIOS = ["idle", "f12_burst", "chaser_storm", "special_chain"]
+
+def parse_benchmark_args(argv):
+    import argparse
+
+    parser = argparse.ArgumentParser(prog="Fireworks4I.py /bench",
+                                     description="Headless, seeded replay of standard scenarios.")
+    parser.add_argument("scenarios", nargs="*", default=BENCHMARK_SCENARIOS,
+                        help=f"any of {', '.join(BENCHMARK_SCENARIOS)} (default: all)")
+    parser.add_argument("--frames", type=int, default=600)
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--size", default="1920x1080", help="WIDTHxHEIGHT of the dummy display")
+    parser.add_argument("--workers", type=int, default=0, help="spark simulation worker processes (0 = in-process)")
+    parser.add_argument("--scale", type=float, default=1.0,
+                        help="draw at this fraction of the resolution and upscale (see render_scale)")
+    parser.add_argument("--style", choices=["flat", "glow"], default="flat", help="spark sprites (see spark_style)")
+    parser.add_argument("--fade", choices=["blit", "pixels"], default="blit", help="trail fade backend (see trail_fade)")
+    parser.add_argument("--fade-bench", action="store_true",
+                        help="only time the trail fade backends at 1080p, 1440p and 4K")
+    parser.add_argument("--tiles", type=int, default=0,
+                        help="also draw every frame with N render tiles on threads and report both timings")
+    parser.add_argument("--out", help="also write the JSON report to this file")
+    args = parser.parse_args(argv)
+    for name in args.scenarios:
+        if name not in BENCHMARK_SCENARIOS:
+            parser.error(f"unknown scenario {name!r}")
+    args.width, args.height = (int(v) for v in args.size.lower().split("x"))
+    return args
+
+def parse_replay_args(argv):
+    import argparse
+
+    parser = argparse.ArgumentParser(prog="Fireworks4I.py /replay",
+                                     description="Play back a recorded session deterministically.")
+    parser.add_argument("session", help="a .fwrec file written with record_session enabled")
+    parser.add_argument("--headless", action="store_true",
+                        help="dummy video driver, no frame cap: runs as fast as the simulation allows")
+    parser.add_argument("--trace", help="write the per-stage frame profile of the whole replay to this CSV")
+    return parser.parse_args(argv)
+
+class SessionRecording:
+    """Compact binary log of everything that steers a session, for replay.
+
+    The simulation is deterministic given the RNG seed, so it is enough to
+    store the seed, the screen size, the active config, the start tick, and
+    per frame: the tick count, how many simulation steps ran, the quality
+    level, the captured cursor position and the input events.
+
+    File layout: MAGIC, a little-endian header (version, seed, width,
+    height, start tick, config length), the config as JSON, then the frame
+    records as one zlib stream.
+
+    A recording is written as it happens: start() writes the header, each
+    frame goes straight into the compressor, and the stream is flushed to
+    disk every FLUSH_FRAMES frames. Memory stays flat however long the
+    session runs, and if the process dies the file still replays up to the
+    last flush."""
+
+    MAGIC = b"FWREC"
+    VERSION = 2
+    HEADER = struct.Struct("<BQHHII")
+    # Version 1 stored the event count in one byte
+    FRAMES = {1: struct.Struct("<IBdiiB"), 2: struct.Struct("<IBdiiH")}
+    FRAME = FRAMES[VERSION]
+    EVENT = struct.Struct("<Bi")
+    FLUSH_FRAMES = 60
+
+    EVENT_QUIT = 0
+    EVENT_MOUSEBUTTON = 1
+    EVENT_KEYDOWN = 2
+
+    def __init__(self, seed, width, height, start_ticks, config):
+        self.seed = seed
+        self.width = width
+        self.height = height
+        self.start_ticks = start_ticks
+        self.config = config
+        # Filled by load(); a session being recorded keeps no frames
+        self.frames = []
+        self.file = None
+        self.compressor = None
+        self.unflushed = 0
+
+    def start(self, path):
+        config = json.dumps(self.config).encode("utf-8")
+        self.file = open(path, "wb")
+        self.file.write(self.MAGIC)
+        self.file.write(self.HEADER.pack(self.VERSION, self.seed, self.width, self.height, self.start_ticks, len(config)))
+        self.file.write(config)
+        self.compressor = zlib.compressobj(6)
+
+    def record_frame(self, ticks, steps, level, pos, events):
+        if self.file is None:
+            return
+        packed = []
+        for event in events:
+            if event.type == pygame.QUIT:
+                packed.append((self.EVENT_QUIT, 0))
+            elif event.type == pygame.MOUSEBUTTONDOWN:
+                packed.append((self.EVENT_MOUSEBUTTON, 0))
+            elif event.type == pygame.KEYDOWN:
+                packed.append((self.EVENT_KEYDOWN, event.key))
+        record = bytearray(self.FRAME.pack(ticks, steps, level, int(pos[0]), int(pos[1]), len(packed)))
+        for kind, key in packed:
+            record += self.EVENT.pack(kind, key)
+        try:
+            self.file.write(self.compressor.compress(bytes(record)))
+            self.unflushed += 1
+            if self.unflushed >= self.FLUSH_FRAMES:
+                self.file.write(self.compressor.flush(zlib.Z_SYNC_FLUSH))
+                self.file.flush()
+                self.unflushed = 0
+        except (OSError, struct.error) as e:
+            # A full disk stops the recording, not the screensaver
+            print(f"Recording error: {e}")
+            self.file.close()
+            self.file = None
+
+    @staticmethod
+    def to_pygame_events(packed):
+        events = []
+        for kind, key in packed:
+            if kind == SessionRecording.EVENT_QUIT:
+                events.append(pygame.event.Event(pygame.QUIT))
+            elif kind == SessionRecording.EVENT_MOUSEBUTTON:
+                events.append(pygame.event.Event(pygame.MOUSEBUTTONDOWN, button=1, pos=(0, 0)))
+            else:
+                events.append(pygame.event.Event(pygame.KEYDOWN, key=key))
+        return events
+
+    def close(self):
+        if self.file is None:
+            return
+        try:
+            self.file.write(self.compressor.flush())
+        except OSError as e:
+            print(f"Recording error: {e}")
+        finally:
+            self.file.close()
+            self.file = None
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "rb") as f:
+            data = f.read()
+        if not data.startswith(cls.MAGIC):
+            raise ValueError(f"{path} is not a fireworks session recording")
+        offset = len(cls.MAGIC)
+        version, seed, width, height, start_ticks, config_len = cls.HEADER.unpack_from(data, offset)
+        if version not in cls.FRAMES:
+            raise ValueError(f"{path}: unsupported recording version {version}")
+        frame = cls.FRAMES[version]
+        offset += cls.HEADER.size
+        config = json.loads(data[offset:offset + config_len].decode("utf-8"))
+        # A session cut off by a crash ends mid-stream; keep what decompresses
+        body = zlib.decompressobj().decompress(data[offset + config_len:])
+
+        session = cls(seed, width, height, start_ticks, config)
+        pos = 0
+        while pos + frame.size <= len(body):
+            ticks, steps, level, x, y, n_events = frame.unpack_from(body, pos)
+            end = pos + frame.size + n_events * cls.EVENT.size
+            if end > len(body):
+                break
+            pos += frame.size
+            events = [cls.EVENT.unpack_from(body, pos + i * cls.EVENT.size) for i in range(n_events)]
+            pos = end
+            session.frames.append((ticks, steps, level, x, y, events))
+        return session
+
+def monitor_rects():
+    """Rect of every monitor relative to the top-left of the virtual
+    desktop, plus that corner in desktop coordinates (to place the window).
+
+    Windows reports the real layout; elsewhere SDL only gives sizes, so
+    monitors are assumed to sit side by side, left to right."""
+    rects = []
+    if sys.platform == "win32":
+        from ctypes import wintypes
+
+        ctypes.windll.user32.SetProcessDPIAware()
+        enum_proc = ctypes.WINFUNCTYPE(ctypes.c_int, wintypes.HMONITOR, wintypes.HDC,
+                                       ctypes.POINTER(wintypes.RECT), wintypes.LPARAM)
+
+        def collect(monitor, dc, rect, data):
+            r = rect.contents
+            rects.append(pygame.Rect(r.left, r.top, r.right - r.left, r.bottom - r.top))
+            return 1
+
+        ctypes.windll.user32.EnumDisplayMonitors(None, None, enum_proc(collect), 0)
+    if not rects:
+        x = 0
+        for w, h in pygame.display.get_desktop_sizes():
+            rects.append(pygame.Rect(x, 0, w, h))
+            x += w
+    left = min(r.left for r in rects)
+    top = min(r.top for r in rects)
+    return [r.move(-left, -top) for r in rects], (left, top)
+
+# Only the screensaver itself parses argv and opens a display. Importing
+# this file (tests, batch runs, spawned simulation workers, which re-import
+# it as __mp_main__ with the parent's argv) just gets the simulation.
+IS_SCRIPT = __name__ == "__main__"
+
+# --- 1. Windows Screensaver Argument Handling ---
+BENCHMARK_MODE = False
+benchmark_args = None
+REPLAY_MODE = False
+replay_args = None
+replay_session = None
+if len(sys.argv) > 1 and IS_SCRIPT:
+    arg = sys.argv[1].lower()
+    if "/p" in arg: pass 
+    if "/c" in arg: 
+        open_settings_window()
+        sys.exit()
+    if "/s" in arg: pass
+    if "/bench" in arg:
+        # Must be set before pygame.display.init() picks a video driver
+        BENCHMARK_MODE = True
+        benchmark_args = parse_benchmark_args(sys.argv[2:])
+        os.environ["SDL_VIDEODRIVER"] = "dummy"
+    if "/replay" in arg:
+        REPLAY_MODE = True
+        replay_args = parse_replay_args(sys.argv[2:])
+        replay_session = SessionRecording.load(replay_args.session)
+        if replay_args.headless:
+            os.environ["SDL_VIDEODRIVER"] = "dummy"
+
+# --- 2. Load Config & Init ---
+# Benchmarks always run on the defaults so results don't depend on the local
+# config; replays run on the config that was recorded with the session
+if BENCHMARK_MODE or not IS_SCRIPT:
+    active_config = dict(DEFAULT_CONFIG)
+elif REPLAY_MODE:
+    active_config = replay_session.config
+else:
+    active_config = load_config()
+mark_startup("config")
+
+if IS_SCRIPT:
+    #pygame.init()
+    pygame.font.init()
+    pygame.display.init()
+
+
+    tile_rects = None
+    if BENCHMARK_MODE:
+        WIDTH, HEIGHT = benchmark_args.width, benchmark_args.height
+        screen = pygame.display.set_mode((WIDTH, HEIGHT))
+    elif REPLAY_MODE:
+        WIDTH, HEIGHT = replay_session.width, replay_session.height
+        screen = pygame.display.set_mode((WIDTH, HEIGHT))
+    elif active_config.get("render_tiles", 0) == "monitors":
+        # One borderless window over the whole virtual desktop
+        tile_rects, origin = monitor_rects()
+        os.environ["SDL_VIDEO_WINDOW_POS"] = f"{origin[0]},{origin[1]}"
+        WIDTH = max(r.right for r in tile_rects)
+        HEIGHT = max(r.bottom for r in tile_rects)
+        screen = pygame.display.set_mode((WIDTH, HEIGHT), pygame.NOFRAME)
+    else:
+        screen_info = pygame.display.Info()
+        WIDTH = screen_info.current_w
+        HEIGHT = screen_info.current_h
+        screen = pygame.display.set_mode((WIDTH, HEIGHT), pygame.FULLSCREEN)
+    pygame.display.set_caption("Fireworks Screensaver")
+    clock = pygame.time.Clock()
+    mark_startup("display")
+FPS = 60  # Simulation steps per second, independent of the render rate
+SIM_DT = 1.0 / FPS
+MAX_CATCHUP_STEPS = 5
+BLACK = (0, 0, 0)
+
+# Fonts are created on first use; see FontCache
+FONT_SPECS = {
+    "wind": ("Arial", 24, False),
+    "timer": ("Consolas", 32, True),
+    "score": ("Consolas", 32, True),
+    "small": ("Consolas", 18, False),
+}
+FONT_INDEX_PATH = os.path.join(CONFIG_DIR, "font_index.json")
+
+# Apply Config (front end only; simulation settings are read by World)
+TRAIL_ALPHA = active_config.get("trail_length", 60)
+
+RENDER_FLIP = "flip"
+RENDER_DIRTY = "dirty_rects"
+# Anything other than dirty_rects renders with full-screen flips
+RENDER_MODE = active_config.get("render_mode", RENDER_FLIP)
+SPRITE_CACHE_SIZE = active_config.get("sprite_cache_size", 2048)
+MAX_FPS = active_config.get("max_fps", 60)
+ADAPTIVE_QUALITY = active_config.get("adaptive_quality", True)
+TARGET_FRAME_MS = active_config.get("target_frame_ms", 14.0)
+SHOW_QUALITY_OVERLAY = active_config.get("show_quality_overlay", False)
+SIM_WORKERS = active_config.get("sim_workers", 0)
+STARTUP_REPORT = active_config.get("startup_report", False)
+PROFILER_HISTORY = active_config.get("profiler_history", 600)
+# 0 = one surface, "monitors" = a tile per monitor across the whole
+# desktop, N = N vertical strips of the one screen
+RENDER_TILES = active_config.get("render_tiles", 0)
+# Fraction of the display resolution trails are drawn at, or "auto"
+RENDER_SCALE = active_config.get("render_scale", 1.0)
+RENDER_SMOOTH = active_config.get("render_smooth", False)
+SPARK_STYLE = active_config.get("spark_style", "flat")
+# "blit" = alpha-blit a black surface, "pixels" = scale the pixel buffer
+TRAIL_FADE = active_config.get("trail_fade", "blit")
+TRAIL_FADE_BOUNDS = active_config.get("trail_fade_bounds", False)
+RECORD_SESSION = active_config.get("record_session", False) and not (BENCHMARK_MODE or REPLAY_MODE)
+if BENCHMARK_MODE:
+    SIM_WORKERS = benchmark_args.workers
+
+POOL_DROP_OLDEST = "drop_oldest"
+POOL_DROP_DIMMEST = "drop_dimmest"
+POOL_REFUSE = "refuse"
+POOL_POLICIES = (POOL_DROP_DIMMEST, POOL_DROP_OLDEST, POOL_REFUSE)
+
+TYPE_ROCKET = 0
+TYPE_SPARK = 1
+TYPE_CHASER = 2 
+TYPE_CLUSTER = 3
+TYPE_TRAIL = 4 
+TYPE_CURSOR_PUSHER = 5 
+
+TYPE_NAMES = ["rocket", "spark", "chaser", "cluster", "trail", "pusher"]
+
+CHASER_CATCH_RADIUS = 30
+# Farthest a burst can reach (spark speed 12 under 0.92 drag is ~140px):
+# a rocket still climbing this far above the top would burst out of sight
+ROCKET_VANISH_HEIGHT = 160
+
+# Burst presets: (speed min, speed max, decay min, decay max)
+BURST_SHAPES = {
+    "sphere": (2, 12, 0.02, 0.05),
+    "ring": (8.5, 9.5, 0.02, 0.035),
+    "willow": (1, 6, 0.006, 0.012),
+}
+
+# Sparks and trails fade geometrically by a fixed rate per step, so their
+# colour is stored as the base colour plus an age and looked up here.
+# FADE_LUT[type, age] is the brightness after age steps in 8-bit fixed
+# point (256 = unfaded); FADE_DEATH[type, r+g+b] is the age at which the
+# faded channels first sum below 10, where the particle used to die.
+FADE_RATES = {TYPE_SPARK: 0.99, TYPE_TRAIL: 0.98}
+FADE_SHIFT = 8
+FADE_STEPS = 1024
+NEVER_DIES = np.iinfo(np.uint16).max
+
+def _build_fade_tables():
+    lut = np.full((len(TYPE_NAMES), FADE_STEPS), 1 << FADE_SHIFT, dtype=np.int32)
+    death = np.full((len(TYPE_NAMES), 3 * 255 + 1), NEVER_DIES, dtype=np.uint16)
+    sums = np.arange(3 * 255 + 1, dtype=np.float64)
+    for p_type, rate in FADE_RATES.items():
+        powers = rate ** np.arange(FADE_STEPS, dtype=np.float64)
+        lut[p_type] = np.round(powers * (1 << FADE_SHIFT))
+        # Number of leading steps still at or above the cutoff, at least one
+        with np.errstate(divide="ignore"):
+            cutoff = 10.0 / sums
+        death[p_type] = np.maximum(1, np.searchsorted(-powers, -cutoff, side="right"))
+    return lut, death
+
+FADE_LUT, FADE_DEATH = _build_fade_tables()
+
+def death_age(p_type, base_sum, radius, decay):
+    """Steps until a spark/trail dies: faded below 10 or shrunk to nothing.
+    Capped to fit the ExpiryWheel."""
+    colour_death = FADE_DEATH[p_type, base_sum]
+    return np.minimum(np.minimum(colour_death, np.ceil(radius / decay)), FADE_STEPS - 1).astype(np.int64)
+
+def random_color(rand=random):
+    c = [rand.randint(50, 255), rand.randint(50, 255), rand.randint(50, 255)]
+    c[rand.randint(0, 2)] = 255
+    return c
+
+# Everything that reads or moves the cursor goes through this, so the
+# benchmark can swap in a scripted mouse.
+mouse = pygame.mouse
+
+# --- Classes ---
+
+class InputState:
+    """Cursor position and clock captured once per frame.
+
+    Every entity in the frame sees the same position. Pushers add their
+    displacement here and commit() applies the total, clamped to the world,
+    with one set_pos() on the device the position came from (if any)."""
+
+    def __init__(self, pos, ticks, device=None):
+        self.mouse_x, self.mouse_y = pos
+        self.ticks = ticks
+        self.device = device
+        self.push_x = 0.0
+        self.push_y = 0.0
+
+    @classmethod
+    def capture(cls):
+        return cls(mouse.get_pos(), pygame.time.get_ticks(), mouse)
+
+    @property
+    def pos(self):
+        return (self.mouse_x, self.mouse_y)
+
+    def push(self, dx, dy):
+        self.push_x += dx
+        self.push_y += dy
+
+    def commit(self, width, height):
+        if self.push_x == 0 and self.push_y == 0:
+            return
+        self.mouse_x = max(0, min(width, self.mouse_x + self.push_x))
+        self.mouse_y = max(0, min(height, self.mouse_y + self.push_y))
+        if self.device is not None:
+            self.device.set_pos(self.mouse_x, self.mouse_y)
+        self.push_x = self.push_y = 0.0
+
+class SpatialHash:
+    """Uniform grid answering "which entities are within r of (x, y)".
+
+    rebuild() buckets entities by cell with one argsort; query() only looks
+    at the cells overlapping the circle, so it costs O(nearby) instead of
+    O(n). Cell coordinates are offset so off-screen positions hash fine."""
+
+    OFFSET = 1 << 20
+
+    def __init__(self, cell=64):
+        self.cell = cell
+        self.keys = np.zeros(0, dtype=np.int64)
+        self.ids = np.zeros(0, dtype=np.int64)
+        self.xs = np.zeros(0, dtype=np.float32)
+        self.ys = np.zeros(0, dtype=np.float32)
+
+    def _key(self, cx, cy):
+        return ((cx + self.OFFSET) << 21) | (cy + self.OFFSET)
+
+    def rebuild(self, ids, xs, ys):
+        cx = np.floor_divide(xs, self.cell).astype(np.int64)
+        cy = np.floor_divide(ys, self.cell).astype(np.int64)
+        keys = self._key(cx, cy)
+        order = np.argsort(keys, kind="stable")
+        self.keys = keys[order]
+        self.ids = np.asarray(ids)[order]
+        self.xs = xs[order]
+        self.ys = ys[order]
+
+    def query(self, x, y, radius):
+        if self.keys.size == 0:
+            return self.ids[:0]
+        c = self.cell
+        cxs = np.arange(math.floor((x - radius) / c), math.floor((x + radius) / c) + 1, dtype=np.int64)
+        cys = np.arange(math.floor((y - radius) / c), math.floor((y + radius) / c) + 1, dtype=np.int64)
+        cells = self._key(cxs[:, None], cys[None, :]).ravel()
+        starts = np.searchsorted(self.keys, cells, side="left")
+        stops = np.searchsorted(self.keys, cells, side="right")
+        spans = [np.arange(a, b) for a, b in zip(starts.tolist(), stops.tolist()) if b > a]
+        if not spans:
+            return self.ids[:0]
+        candidates = np.concatenate(spans)
+        dx = self.xs[candidates] - x
+        dy = self.ys[candidates] - y
+        return self.ids[candidates[dx * dx + dy * dy < radius * radius]]
+
+
+def step_sparks(arrays, lo, hi, gravity, wind, width, height):
+    """Spark and trail physics for rows [lo, hi). Rows never interact, so
+    any split of the range gives the same result. Returns the rows that died.
+
+    Fading is by age (see FADE_LUT), so a step here only bumps the age;
+    dying of age is handled by ParticleStore's ExpiryWheel.
+
+    A spark that is off the sides or bottom of the width x height screen
+    and still heading away (with the wind not blowing it back) can never
+    be seen again, so it dies there instead of fading out of sight."""
+    alive = arrays["alive"][lo:hi]
+    p_type = arrays["type"][lo:hi]
+    x, y = arrays["x"], arrays["y"]
+    vx, vy = arrays["vx"], arrays["vy"]
+    age_arr = arrays["age"]
+    radius_arr, decay = arrays["radius"], arrays["decay"]
+    died = []
+
+    for spark_type, drag in ((TYPE_SPARK, 0.92), (TYPE_TRAIL, 0.96)):
+        idx = np.flatnonzero(alive & (p_type == spark_type)) + lo
+        if idx.size == 0:
+            continue
+        svx = (vx[idx] + wind * 0.02) * drag
+        svy = (vy[idx] + gravity) * drag
+        vx[idx] = svx
+        vy[idx] = svy
+        age_arr[idx] += 1
+        radius = radius_arr[idx] - decay[idx]
+        radius_arr[idx] = radius
+        sx = x[idx] + svx
+        sy = y[idx] + svy
+        x[idx] = sx
+        y[idx] = sy
+        gone = (((sx < -radius) & (svx <= 0) & (wind <= 0))
+                | ((sx > width + radius) & (svx >= 0) & (wind >= 0))
+                | ((sy > height + radius) & (svy >= 0) & (gravity >= 0)))
+        if gone.any():
+            arrays["alive"][idx[gone]] = False
+            died.append(idx[gone])
+
+    return np.concatenate(died) if died else np.zeros(0, dtype=np.intp)
+
+
+def _spark_worker(shm_name, layout, capacity, conn):
+    from multiprocessing import shared_memory
+
+    shm = shared_memory.SharedMemory(name=shm_name)
+    arrays = {name: np.ndarray((capacity,), dtype=dtype, buffer=shm.buf, offset=offset)
+              for name, dtype, offset in layout}
+    try:
+        while True:
+            job = conn.recv()
+            if job is None:
+                break
+            conn.send(step_sparks(arrays, *job))
+    finally:
+        del arrays
+        shm.close()
+
+
+class SparkWorkers:
+    """Process pool that steps slices of the shared particle arrays.
+
+    The main process keeps events, rockets, chasers, pushers and drawing;
+    workers only run step_sparks() on their row range and send back the
+    rows that died."""
+
+    MIN_ROWS = 4096  # Below this the pipe round-trip costs more than the work
+
+    def __init__(self, count, shm_name, layout, capacity):
+        import multiprocessing
+
+        ctx = multiprocessing.get_context("spawn")
+        self.conns = []
+        self.procs = []
+        for _ in range(count):
+            parent, child = ctx.Pipe()
+            proc = ctx.Process(target=_spark_worker, args=(shm_name, layout, capacity, child), daemon=True)
+            proc.start()
+            self.conns.append(parent)
+            self.procs.append(proc)
+
+    def start(self, n, gravity, wind, width, height):
+        """Send each worker its slice of [0, n). Returns False if n is too
+        small to be worth sharding, in which case nothing was sent."""
+        if n < self.MIN_ROWS:
+            return False
+        bounds = np.linspace(0, n, len(self.conns) + 1).astype(int).tolist()
+        for conn, lo, hi in zip(self.conns, bounds[:-1], bounds[1:]):
+            conn.send((lo, hi, gravity, wind, width, height))
+        return True
+
+    def finish(self):
+        return np.concatenate([conn.recv() for conn in self.conns])
+
+    def close(self):
+        for conn in self.conns:
+            conn.send(None)
+        for proc in self.procs:
+            proc.join(timeout=1)
+
+
+class ExpiryWheel:
+    """Timing wheel of death steps: slot (now + delay) % size holds the rows
+    due to die then, so expiring a step touches only what is due.
+
+    Rows are filed with their birth serial; a row that died early and was
+    recycled no longer matches, and the store skips it. Delays must be
+    below size."""
+
+    def __init__(self, size):
+        self.size = size
+        self.now = 0
+        self.rows = [[] for _ in range(size)]
+        self.serials = [[] for _ in range(size)]
+
+    def schedule_one(self, row, serial, delay):
+        slot = (self.now + delay) % self.size
+        self.rows[slot].append([row])
+        self.serials[slot].append([serial])
+
+    def schedule(self, rows, serials, delays):
+        # Group the batch by slot with one sort rather than a pass per slot
+        order = np.argsort(delays, kind="stable")
+        delays = delays[order]
+        cuts = np.flatnonzero(np.diff(delays)) + 1
+        starts = [0] + cuts.tolist()
+        ends = cuts.tolist() + [len(delays)]
+        for lo, hi in zip(starts, ends):
+            slot = (self.now + int(delays[lo])) % self.size
+            self.rows[slot].append(rows[order[lo:hi]])
+            self.serials[slot].append(serials[order[lo:hi]])
+
+    def advance(self):
+        """Move to the next step and return (rows, serials) due on it."""
+        self.now += 1
+        slot = self.now % self.size
+        if not self.rows[slot]:
+            return np.zeros(0, dtype=np.intp), np.zeros(0, dtype=np.int64)
+        rows = np.concatenate(self.rows[slot]).astype(np.intp)
+        serials = np.concatenate(self.serials[slot]).astype(np.int64)
+        self.rows[slot] = []
+        self.serials[slot] = []
+        return rows, serials
+
+
+class ParticleStore:
+    """Every spark, trail, rocket and pusher lives here as one row of a set of
+    contiguous NumPy arrays, so a frame moves each particle type in one step.
+
+    r, g, b hold the colour a particle was born with; sparks and trails fade
+    by age through FADE_LUT. Their death step is known at spawn, so they are
+    filed in an ExpiryWheel and each step kills only the rows due then.
+
+    The arrays are allocated once at a fixed capacity. Dead rows go back on a
+    free list and are recycled by the next spawn, so bursts never allocate.
+    When the pool is full the policy decides: "drop_dimmest" recycles the
+    least visible sparks/trails (off-screen first, then dimmest and
+    smallest), "drop_oldest" the oldest ones, "refuse" makes spawn()
+    return -1.
+
+    With workers > 0 the arrays live in one shared-memory block and spark
+    and trail rows are stepped by a SparkWorkers pool.
+
+    Screen bounds, physics settings and both RNGs come from the owning
+    World."""
+
+    FIELDS = {
+        "x": np.float32, "y": np.float32,
+        "px": np.float32, "py": np.float32,
+        "vx": np.float32, "vy": np.float32,
+        "r": np.uint8, "g": np.uint8, "b": np.uint8,
+        "age": np.uint16,
+        "radius": np.float32, "decay": np.float32,
+        "type": np.int8, "alive": np.bool_,
+        "fuel": np.int32, "max_speed": np.float32,
+        "source": np.int8, "owner": np.int64, "born": np.int64,
+    }
+
+    def __init__(self, world, capacity=20000, policy=POOL_DROP_DIMMEST, workers=0):
+        self.world = world
+        self.capacity = capacity
+        # An unknown policy (a typo in the config) gets the default
+        self.policy = policy if policy in POOL_POLICIES else POOL_DROP_DIMMEST
+        self.count = 0      # High-water mark: rows at or above it were never used
+        self.live = 0
+        self.serial = 0
+        # Live rows per owning firework uid; an owner leaves when it hits 0.
+        # Kept up to date on spawn and release, so it costs O(spawned + died)
+        self.owner_live = {}
+        self.expiry = ExpiryWheel(FADE_STEPS)
+        self.chaser_grid = SpatialHash()
+        self.chasers_at_mouse = set()
+        self.shm = None
+        self.workers = None
+        if workers > 0:
+            self._allocate_shared(workers)
+        else:
+            self.arrays = {name: np.zeros(capacity, dtype=dtype) for name, dtype in self.FIELDS.items()}
+        for name, arr in self.arrays.items():
+            setattr(self, name, arr)
+        # LIFO stack of free rows, popped from the end so low rows are reused first
+        self.free = np.arange(capacity - 1, -1, -1, dtype=np.int32)
+        self.free_count = capacity
+
+    def _allocate_shared(self, workers):
+        from multiprocessing import shared_memory
+
+        layout = []
+        offset = 0
+        for name, dtype in self.FIELDS.items():
+            layout.append((name, np.dtype(dtype).str, offset))
+            offset += -(-self.capacity * np.dtype(dtype).itemsize // 8) * 8
+        self.shm = shared_memory.SharedMemory(create=True, size=offset)
+        self.arrays = {}
+        for name, dtype, field_offset in layout:
+            arr = np.ndarray((self.capacity,), dtype=dtype, buffer=self.shm.buf, offset=field_offset)
+            arr[:] = 0
+            self.arrays[name] = arr
+        self.workers = SparkWorkers(workers, self.shm.name, layout, self.capacity)
+
+    def close(self):
+        if self.workers is not None:
+            self.workers.close()
+            self.workers = None
+        if self.shm is not None:
+            for name in self.FIELDS:
+                delattr(self, name)
+            self.arrays = {}
+            self.shm.close()
+            self.shm.unlink()
+            self.shm = None
+
+    def _alloc(self):
+        if self.free_count == 0:
+            if self.policy == POOL_REFUSE or not self._evict():
+                return -1
+        self.free_count -= 1
+        i = int(self.free[self.free_count])
+        if i >= self.count:
+            self.count = i + 1
+        self.live += 1
+        return i
+
+    def _release(self, idx):
+        k = len(idx)
+        if k == 0:
+            return
+        self.free[self.free_count:self.free_count + k] = idx
+        self.free_count += k
+        self.live -= k
+        if k == 1:
+            # kill() releases rows one at a time; skip the sort
+            owners, counts = [int(self.owner[idx[0]])], [1]
+        else:
+            owners, counts = np.unique(self.owner[idx], return_counts=True)
+            owners, counts = owners.tolist(), counts.tolist()
+        for owner, count in zip(owners, counts):
+            if owner < 0:
+                continue
+            left = self.owner_live[owner] - count
+            if left:
+                self.owner_live[owner] = left
+            else:
+                del self.owner_live[owner]
+
+    def _add_owned(self, owner, k):
+        if owner >= 0:
+            self.owner_live[owner] = self.owner_live.get(owner, 0) + k
+
+    def _alloc_many(self, k):
+        """Pop up to k free rows at once (fewer if the pool is full and
+        refusing). Returns them as an index array."""
+        if self.free_count < k and self.policy != POOL_REFUSE:
+            self._evict(k - self.free_count)
+        k = min(k, self.free_count)
+        rows = self.free[self.free_count - k:self.free_count][::-1].astype(np.intp)
+        self.free_count -= k
+        self.live += k
+        if k:
+            self.count = max(self.count, int(rows.max()) + 1)
+        return rows
+
+    def _evict(self, at_least=1):
+        # Only sparks and trails are evicted; rockets, chasers and pushers are
+        # referenced by their Firework and must stay put. Evict a batch so a
+        # full pool doesn't pay for a search on every single spawn.
+        n = self.count
+        p_type = self.type[:n]
+        candidates = np.flatnonzero(self.alive[:n] & ((p_type == TYPE_SPARK) | (p_type == TYPE_TRAIL)))
+        if candidates.size == 0:
+            return False
+        batch = min(candidates.size, max(at_least, self.capacity // 64))
+        if self.policy == POOL_DROP_OLDEST:
+            priority = self.born[candidates]
+        else:
+            # Visibility ~ brightest channel x radius; off-screen rows go first
+            xs = self.x[candidates]
+            ys = self.y[candidates]
+            on_screen = (xs >= 0) & (xs < self.world.width) & (ys >= 0) & (ys < self.world.height)
+            brightness = np.maximum(np.maximum(self.r[candidates], self.g[candidates]), self.b[candidates])
+            brightness = brightness * self.faded(candidates)
+            priority = np.where(on_screen, brightness * self.radius[candidates], -1.0)
+        victims = candidates[np.argpartition(priority, batch - 1)[:batch]]
+        self.alive[victims] = False
+        self._release(victims)
+        return True
+
+    def spawn(self, x, y, color, p_type, vx=0, vy=0, owner=-1, source_type=-1):
+        i = self._alloc()
+        if i < 0:
+            return -1
+
+        rand = self.world.random
+        if p_type == TYPE_SPARK or p_type == TYPE_TRAIL:
+            if vx == 0 and vy == 0:
+                angle = rand.uniform(0, 2 * math.pi)
+                speed = rand.uniform(2, 12)
+                vx = math.cos(angle) * speed
+                vy = math.sin(angle) * speed
+            radius = rand.randint(2, 4)
+            decay = rand.uniform(0.02, 0.05)
+        elif p_type == TYPE_CHASER:
+            radius = 6
+            decay = 0
+            self.fuel[i] = rand.randint(600, 900)
+            self.max_speed[i] = rand.uniform(8, 21)
+        elif p_type == TYPE_CURSOR_PUSHER:
+            radius = 0
+            decay = 0
+        else:
+            radius = 4
+            decay = 0
+
+        self.x[i] = self.px[i] = x
+        self.y[i] = self.py[i] = y
+        self.vx[i] = vx
+        self.vy[i] = vy
+        self.r[i], self.g[i], self.b[i] = color
+        self.radius[i] = radius
+        self.decay[i] = decay
+        self.age[i] = 0
+        if p_type in FADE_RATES:
+            self.expiry.schedule_one(i, self.serial, int(death_age(p_type, sum(color), radius, decay)))
+        self.type[i] = p_type
+        self.alive[i] = True
+        self.source[i] = source_type
+        self.owner[i] = owner
+        self._add_owned(owner, 1)
+        self.born[i] = self.serial
+        self.serial += 1
+        return i
+
+    def spawn_burst(self, amount, x, y, color, owner=-1, shape="sphere"):
+        """Spawn a whole burst of sparks with one batched draw per attribute.
+
+        shape picks a preset from BURST_SHAPES: speed range and decay range.
+        A narrow speed range makes a ring, a slow one with long life a willow."""
+        rows = self._alloc_many(amount)
+        k = rows.size
+        if k == 0:
+            return rows
+        speed_lo, speed_hi, decay_lo, decay_hi = BURST_SHAPES[shape]
+        rng = self.world.rng
+        angle = rng.uniform(0, 2 * math.pi, k)
+        speed = rng.uniform(speed_lo, speed_hi, k)
+
+        self.x[rows] = x
+        self.y[rows] = y
+        self.px[rows] = x
+        self.py[rows] = y
+        self.vx[rows] = np.cos(angle) * speed
+        self.vy[rows] = np.sin(angle) * speed
+        self.r[rows], self.g[rows], self.b[rows] = color
+        radius = rng.integers(2, 5, k)
+        decay = rng.uniform(decay_lo, decay_hi, k)
+        self.radius[rows] = radius
+        self.decay[rows] = decay
+        self.age[rows] = 0
+        self.type[rows] = TYPE_SPARK
+        self.alive[rows] = True
+        self.source[rows] = -1
+        self.owner[rows] = owner
+        self._add_owned(owner, k)
+        serials = np.arange(self.serial, self.serial + k)
+        self.born[rows] = serials
+        self.serial += k
+        self.expiry.schedule(rows, serials, death_age(TYPE_SPARK, sum(color), radius, decay.astype(np.float32)))
+        return rows
+
+    def faded(self, idx):
+        """Brightness factor (0-1) of rows idx at their current age."""
+        return FADE_LUT[self.type[idx], np.minimum(self.age[idx], FADE_STEPS - 1)] / float(1 << FADE_SHIFT)
+
+    def kill(self, i):
+        if self.alive[i]:
+            self.alive[i] = False
+            self._release([i])
+
+    def update(self, frame_input):
+        """Advance every particle one simulation step and recycle the rows that died."""
+        n = self.count
+        # Keep the previous step's positions for render interpolation
+        self.px[:n] = self.x[:n]
+        self.py[:n] = self.y[:n]
+        # Sparks and trails that reach their death age this step, O(expired)
+        rows, serials = self.expiry.advance()
+        if rows.size:
+            due = rows[self.alive[rows] & (self.born[rows] == serials)]
+            self.alive[due] = False
+            self._release(due)
+
+        alive = self.alive[:n].copy()
+        p_type = self.type[:n]
+
+        # Sparks and trails go to the workers (or run here); everything
+        # below touches only rocket, chaser and pusher rows meanwhile.
+        world = self.world
+        physics = (world.gravity, world.wind, world.width, world.height)
+        sharded = self.workers is not None and self.workers.start(n, *physics)
+        if not sharded:
+            self._release(step_sparks(self.arrays, 0, n, *physics))
+
+        rockets = np.flatnonzero(alive & ((p_type == TYPE_ROCKET) | (p_type == TYPE_CLUSTER)))
+        self.vy[rockets] += world.gravity
+        self.x[rockets] += self.vx[rockets]
+        self.y[rockets] += self.vy[rockets]
+
+        chasers = np.flatnonzero(alive & (p_type == TYPE_CHASER))
+        if chasers.size:
+            self._update_chasers(chasers, frame_input.pos)
+
+        pushers = np.flatnonzero(alive & (p_type == TYPE_CURSOR_PUSHER))
+        for i in pushers.tolist():
+            self._update_pusher(i, frame_input)
+
+        self.x[chasers] += self.vx[chasers]
+        self.y[chasers] += self.vy[chasers]
+
+        if sharded:
+            self._release(self.workers.finish())
+
+        # Index chasers once per step; proximity checks then query the grid
+        self.chaser_grid.rebuild(chasers, self.x[chasers], self.y[chasers])
+        self.chasers_at_mouse = set(self.chaser_grid.query(frame_input.mouse_x, frame_input.mouse_y, CHASER_CATCH_RADIUS).tolist())
+
+    def _update_chasers(self, idx, mouse_pos):
+        mx, my = mouse_pos
+        x = self.x[idx]
+        y = self.y[idx]
+        angle = np.arctan2(my - y, mx - x)
+
+        thrust_power = 0.4
+        vx = self.vx[idx] + np.cos(angle) * thrust_power
+        vy = self.vy[idx] + np.sin(angle) * thrust_power
+
+        max_speed = self.max_speed[idx]
+        current_speed = np.hypot(vx, vy)
+        scale = np.where(current_speed > max_speed, max_speed / np.maximum(current_speed, 1e-6), 1.0)
+        vx *= scale
+        vy *= scale
+
+        fuel = self.fuel[idx] - 1
+        self.fuel[idx] = fuel
+        sputter = (fuel < 100) & (self.world.rng.integers(0, 11, idx.size) == 0)
+        vx[sputter] *= 0.9
+        vy[sputter] *= 0.9
+
+        self.vx[idx] = vx
+        self.vy[idx] = vy
+
+    def _update_pusher(self, i, frame_input):
+        vx = float(self.vx[i])
+        vy = float(self.vy[i])
+
+        # --- HIT REGISTRATION ---
+        force_applied = math.hypot(vx, vy)
+        HIT_THRESHOLD = 3.0
+
+        # Displacement is applied (and bound-checked) once at the end of the frame
+        if force_applied > 0:
+            frame_input.push(vx, vy)
+
+        if force_applied > HIT_THRESHOLD:
+            self.world.register_hit(int(self.source[i]), frame_input.ticks)
+
+        vx *= 0.9
+        vy *= 0.9
+        self.vx[i] = vx
+        self.vy[i] = vy
+        if abs(vx) < 0.1 and abs(vy) < 0.1:
+            self.kill(i)
+
+    def positions(self, alpha=1.0):
+        """Render positions of visible rows, blended between the last two
+        simulation steps by alpha (1.0 = latest step). Rows entirely off
+        screen (chasers circling back in, mostly) are left out."""
+        n = self.count
+        rows = np.flatnonzero(self.alive[:n] & (self.radius[:n] >= 1))
+        xs = self.x[rows]
+        ys = self.y[rows]
+        if alpha < 1.0:
+            px = self.px[rows]
+            py = self.py[rows]
+            xs = px + (xs - px) * alpha
+            ys = py + (ys - py) * alpha
+        radius = self.radius[rows]
+        width, height = self.world.width, self.world.height
+        on_screen = (xs > -radius) & (xs < width + radius) & (ys > -radius) & (ys < height + radius)
+        if on_screen.all():
+            return rows, xs, ys
+        return rows[on_screen], xs[on_screen], ys[on_screen]
+
+    def sprites(self, alpha=1.0, scale=1.0):
+        """Integer position, faded colour and radius of every visible row,
+        for a surface at scale times the world's resolution."""
+        visible, xs, ys = self.positions(alpha)
+        fade = FADE_LUT[self.type[visible], np.minimum(self.age[visible], FADE_STEPS - 1)]
+        radii = self.radius[visible]
+        if scale != 1.0:
+            xs = xs * scale
+            ys = ys * scale
+            radii = np.maximum(1.0, radii * scale + 0.5)
+        return (xs.astype(np.int32), ys.astype(np.int32),
+                (self.r[visible] * fade) >> FADE_SHIFT,
+                (self.g[visible] * fade) >> FADE_SHIFT,
+                (self.b[visible] * fade) >> FADE_SHIFT,
+                radii.astype(np.int32))
+
+    def draw(self, surface, atlas=None, alpha=1.0, scale=1.0):
+        xs, ys, rs, gs, bs, radii = self.sprites(alpha, scale)
+        if atlas is not None:
+            atlas.draw(surface, xs, ys, rs, gs, bs, radii)
+            return
+        for x, y, r, g, b, radius in zip(xs.tolist(), ys.tolist(), rs.tolist(), gs.tolist(), bs.tolist(), radii.tolist()):
+            pygame.draw.circle(surface, (r, g, b), (x, y), radius)
+
+
+class SpriteAtlas:
+    """Pre-rendered spark circles keyed on (quantized colour, radius).
+
+    Colours are quantized to 32 levels per channel, which is below what a
+    fading 2-6px blob can show. The cache is bounded and evicts the least
+    recently used sprite.
+
+    A sprite reaches SPREAD * radius from the particle's centre and is
+    blitted with BLEND special flags (0 = plain copy)."""
+
+    QUANT_SHIFT = 3
+    SPREAD = 1
+    BLEND = 0
+
+    def __init__(self, max_sprites=2048):
+        self.max_sprites = max_sprites
+        self.sprites = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def keys_for(self, rs, gs, bs, radii):
+        s = self.QUANT_SHIFT
+        return ((((rs >> s) << 10) | ((gs >> s) << 5) | (bs >> s)) << 3) | radii
+
+    def color_of(self, key):
+        c = key >> 3
+        half = 1 << (self.QUANT_SHIFT - 1)
+        return ((((c >> 10) & 31) << self.QUANT_SHIFT) + half,
+                (((c >> 5) & 31) << self.QUANT_SHIFT) + half,
+                ((c & 31) << self.QUANT_SHIFT) + half)
+
+    def _render(self, key):
+        radius = key & 7
+        color = self.color_of(key)
+        sprite = pygame.Surface((radius * 2, radius * 2))
+        sprite.set_colorkey(BLACK, pygame.RLEACCEL)
+        pygame.draw.circle(sprite, color, (radius, radius), radius)
+        return sprite
+
+    def get(self, key):
+        sprite = self.sprites.get(key)
+        if sprite is not None:
+            self.sprites.move_to_end(key)
+            self.hits += 1
+            return sprite
+        self.misses += 1
+        sprite = self._render(key)
+        self.sprites[key] = sprite
+        if len(self.sprites) > self.max_sprites:
+            self.sprites.popitem(last=False)
+        return sprite
+
+    def draw(self, surface, xs, ys, rs, gs, bs, radii):
+        if len(xs) == 0:
+            return
+        # One cache lookup per distinct sprite, then a single blits() call
+        keys, inverse = np.unique(self.keys_for(rs, gs, bs, radii), return_inverse=True)
+        sprites = [self.get(key) for key in keys.tolist()]
+        blit_sprites = map(sprites.__getitem__, inverse.tolist())
+        reach = radii * self.SPREAD
+        dests = zip((xs - reach).tolist(), (ys - reach).tolist())
+        if self.BLEND:
+            batch = zip(blit_sprites, dests, itertools.repeat(None), itertools.repeat(self.BLEND))
+        else:
+            batch = zip(blit_sprites, dests)
+        surface.blits(list(batch), doreturn=False)
+
+
+class GlowAtlas(SpriteAtlas):
+    """Soft glow sprites that add light where they overlap (BLEND_ADD).
+
+    Each radius has one radial falloff mask, computed up front: full
+    brightness in the core, fading to nothing at twice the radius. A
+    sprite is that mask tinted by the quantized colour. Tinted sprites
+    share the bounded LRU cache with the flat ones. Black adds nothing, so
+    glow sprites need no colorkey."""
+
+    SPREAD = 2
+    BLEND = pygame.BLEND_ADD
+
+    def __init__(self, max_sprites=2048):
+        super().__init__(max_sprites)
+        self.falloff = {radius: self._falloff(radius) for radius in range(1, 8)}
+
+    def _falloff(self, radius):
+        size = radius * self.SPREAD * 2
+        d = np.hypot(*np.meshgrid(np.arange(size) + 0.5 - size / 2, np.arange(size) + 0.5 - size / 2))
+        core = radius * 0.5
+        outer = radius * self.SPREAD
+        return np.clip((outer - d) / (outer - core), 0.0, 1.0) ** 2
+
+    def _render(self, key):
+        radius = max(1, key & 7)
+        color = np.array(self.color_of(key), dtype=np.float32)
+        pixels = (self.falloff[radius][:, :, None] * color).astype(np.uint8)
+        return pygame.surfarray.make_surface(pixels)
+
+
+SPRITE_STYLES = {"flat": SpriteAtlas, "glow": GlowAtlas}
+
+
+class BlitFade:
+    """Fades trails by alpha-blitting a black surface over the target."""
+
+    def __init__(self, size, trail_alpha):
+        self.surface = pygame.Surface(size)
+        self.surface.set_alpha(trail_alpha)
+        self.surface.fill(BLACK)
+
+    def apply(self, target, rect=None):
+        if rect is None:
+            target.blit(self.surface, (0, 0))
+        else:
+            target.blit(self.surface, rect, rect)
+
+
+class PixelFade:
+    """Fades trails in place in the target's pixel buffer, no fade surface.
+
+    Each channel becomes (c * (256 - trail_alpha)) >> 8, which is exactly
+    what the alpha blit computes, so both backends draw the same trails.
+    32-bit surfaces are scaled as packed pixels, red and blue in one
+    multiply and green in another; pixels3d is a strided byte view and
+    costs about ten times as much, so it is only the fallback for other
+    depths. Rows are done in bands small enough to stay in cache."""
+
+    BAND_PIXELS = 1 << 16
+
+    def __init__(self, size, trail_alpha):
+        self.keep = 256 - trail_alpha
+        # Flat, so every band's scratch is contiguous whatever the rect width
+        self.scratch = np.empty((2, max(self.BAND_PIXELS, size[0])), dtype=np.uint32)
+
+    def apply(self, target, rect=None):
+        rect = target.get_rect() if rect is None else pygame.Rect(rect).clip(target.get_rect())
+        if rect.width == 0 or rect.height == 0:
+            return
+        if target.get_bytesize() == 4:
+            self._apply_packed(target, rect)
+        else:
+            self._apply_channels(target, rect)
+
+    def _apply_packed(self, target, rect):
+        pixels = pygame.surfarray.pixels2d(target)[rect.left:rect.right, rect.top:rect.bottom].T
+        band = self.scratch.shape[1] // rect.width
+        for top in range(0, rect.height, band):
+            rows = pixels[top:top + band]
+            rb = self.scratch[0, :rows.size].reshape(rows.shape)
+            g = self.scratch[1, :rows.size].reshape(rows.shape)
+            np.bitwise_and(rows, 0xFF00FF, out=rb)
+            np.multiply(rb, self.keep, out=rb)
+            np.bitwise_and(rb, 0xFF00FF00, out=rb)
+            np.bitwise_and(rows, 0x00FF00, out=g)
+            np.multiply(g, self.keep, out=g)
+            np.bitwise_and(g, 0x00FF0000, out=g)
+            np.bitwise_or(rb, g, out=rb)
+            np.right_shift(rb, 8, out=rows)
+        del pixels, rows
+
+    def _apply_channels(self, target, rect):
+        pixels = pygame.surfarray.pixels3d(target)[rect.left:rect.right, rect.top:rect.bottom]
+        band = max(1, self.BAND_PIXELS // rect.width)
+        for top in range(0, rect.height, band):
+            cols = pixels[:, top:top + band]
+            wide = cols.astype(np.uint16)
+            np.multiply(wide, self.keep, out=wide)
+            np.right_shift(wide, 8, out=wide)
+            cols[...] = wide
+        del pixels, cols
+
+
+TRAIL_FADES = {"blit": BlitFade, "pixels": PixelFade}
+
+
+def measure_fade_frames(fade, limit=255):
+    # Run the real fade on one pixel; its rounding decides when a trail stalls
+    probe = pygame.Surface((1, 1))
+    probe.fill((255, 255, 255))
+    area = pygame.Rect(0, 0, 1, 1)
+    for frames in range(1, limit + 1):
+        before = probe.get_at((0, 0))
+        fade.apply(probe, area)
+        if probe.get_at((0, 0)) == before:
+            return frames
+    return limit
+
+
+class FadeBounds:
+    """The part of the target that can still hold a visible trail.
+
+    Everything drawn is marked here; a mark stays in the bounding box for
+    as many fade steps as a full-bright pixel needs to stop changing, the
+    same lifetime DirtyTiles gives its tiles. Fading only this box skips
+    the empty sky around the fireworks."""
+
+    def __init__(self, fade_frames):
+        self.history = deque(maxlen=fade_frames)
+        self.current = None
+
+    def mark(self, rect):
+        self.current = pygame.Rect(rect) if self.current is None else self.current.union(rect)
+
+    def mark_points(self, xs, ys, pad):
+        if len(xs) == 0:
+            return
+        left = int(xs.min()) - pad
+        top = int(ys.min()) - pad
+        self.mark(pygame.Rect(left, top, int(xs.max()) + pad - left + 1, int(ys.max()) + pad - top + 1))
+
+    def rect(self):
+        rects = [r for r in self.history if r is not None]
+        if self.current is not None:
+            rects.append(self.current)
+        if not rects:
+            return None
+        return rects[0].unionall(rects[1:])
+
+    def age(self):
+        self.history.append(self.current)
+        self.current = None
+
+
+class DirtyTiles:
+    """Tracks which screen tiles hold something that is still fading out.
+
+    A tile touched this frame is kept dirty for as many frames as the trail
+    fade needs to take a full-bright pixel down to where it stops changing,
+    so every faded and updated region is exactly where trails can exist."""
+
+    def __init__(self, width, height, fade, tile=64):
+        self.width = width
+        self.height = height
+        self.tile = tile
+        self.cols = (width + tile - 1) // tile
+        self.rows = (height + tile - 1) // tile
+        self.ttl = np.zeros((self.rows, self.cols), dtype=np.int16)
+        self.fade_frames = measure_fade_frames(fade)
+
+    def mark_points(self, xs, ys, pad):
+        if len(xs) == 0:
+            return
+        t = self.tile
+        for ox in (-pad, pad):
+            for oy in (-pad, pad):
+                cols = np.clip((xs + ox) // t, 0, self.cols - 1).astype(np.intp)
+                rows = np.clip((ys + oy) // t, 0, self.rows - 1).astype(np.intp)
+                self.ttl[rows, cols] = self.fade_frames
+
+    def mark_rect(self, rect):
+        t = self.tile
+        c0 = max(0, rect.left // t)
+        c1 = min(self.cols, (rect.right + t - 1) // t)
+        r0 = max(0, rect.top // t)
+        r1 = min(self.rows, (rect.bottom + t - 1) // t)
+        self.ttl[r0:r1, c0:c1] = self.fade_frames
+
+    def rects(self):
+        # Merge horizontal runs of dirty tiles so each row costs few rects
+        t = self.tile
+        out = []
+        for row in np.flatnonzero(self.ttl.any(axis=1)).tolist():
+            dirty = np.concatenate(([False], self.ttl[row] > 0, [False]))
+            edges = np.flatnonzero(dirty[1:] != dirty[:-1])
+            for start, stop in zip(edges[::2].tolist(), edges[1::2].tolist()):
+                rect = pygame.Rect(start * t, row * t, (stop - start) * t, t)
+                out.append(rect.clip(0, 0, self.width, self.height))
+        return out
+
+    def age(self):
+        np.subtract(self.ttl, 1, out=self.ttl, where=self.ttl > 0)
+
+
+class ScaledTarget:
+    """Where trails and sparks are drawn. At scale 1.0 that is the screen
+    itself; below it is an off-screen surface at that fraction of the
+    resolution, which present() upscales onto the screen every frame. The
+    fade and sprite blits then touch scale^2 as many pixels, and 2-6px
+    sparks look the same.
+
+    With auto on, record() moves through STEPS based on the measured
+    fade + draw + upscale time, the same way QualityGovernor does: down
+    quickly when over budget, back up slowly when there is headroom."""
+
+    # The upscale costs about as much as one full-resolution fade, so 0.75
+    # saves nothing; auto only switches between full and half resolution
+    STEPS = (1.0, 0.5)
+
+    def __init__(self, screen, scale, trail_alpha, smooth=False, auto=False, budget_ms=7.0, fade_class=BlitFade):
+        self.screen = screen
+        self.trail_alpha = trail_alpha
+        self.fade_class = fade_class
+        self.smooth = smooth
+        self.auto = auto
+        self.budget_ms = budget_ms
+        self.avg_ms = 0.0
+        self.cooldown = 0
+        self.scale = None
+        self.surface = screen
+        self.set_scale(scale)
+
+    def set_scale(self, scale):
+        scale = min(1.0, scale)
+        if scale == self.scale:
+            return
+        width, height = self.screen.get_size()
+        previous = self.surface
+        if scale == 1.0:
+            # The screen already holds the last upscaled frame
+            self.surface = self.screen
+        else:
+            self.surface = pygame.Surface((max(1, round(width * scale)), max(1, round(height * scale))))
+            # Carry the trails over rather than starting from black
+            pygame.transform.scale(previous, self.surface.get_size(), self.surface)
+        self.fade = self.fade_class(self.surface.get_size(), self.trail_alpha)
+        self.scale = scale
+
+    def present(self):
+        if self.surface is self.screen:
+            return
+        if self.smooth:
+            pygame.transform.smoothscale(self.surface, self.screen.get_size(), self.screen)
+        else:
+            pygame.transform.scale(self.surface, self.screen.get_size(), self.screen)
+
+    def record(self, render_ms):
+        if not self.auto:
+            return
+        self.avg_ms += (render_ms - self.avg_ms) * 0.1
+        if self.cooldown > 0:
+            self.cooldown -= 1
+            return
+        i = self.STEPS.index(self.scale) if self.scale in self.STEPS else 0
+        if self.avg_ms > self.budget_ms and i + 1 < len(self.STEPS):
+            self.set_scale(self.STEPS[i + 1])
+            self.cooldown = 30
+        elif self.avg_ms < self.budget_ms * 0.4 and i > 0:
+            # Going up roughly doubles the cost, so only with plenty of room
+            self.set_scale(self.STEPS[i - 1])
+            self.cooldown = 120
+
+
+class TiledRenderer:
+    """Fades and draws the screen as separate tiles, one thread per tile.
+
+    Each tile is a subsurface of the screen, so tiles write disjoint pixels
+    and nothing needs compositing afterwards; pygame drops the GIL while it
+    blits, so the tiles' fades and sprite blits run in parallel. Every tile
+    has its own fade and SpriteAtlas, so threads share no surfaces.
+
+    A sprite is drawn into every tile it overlaps, shifted into that tile's
+    coordinates, so fireworks crossing a boundary are drawn whole."""
+
+    def __init__(self, surface, rects, trail_alpha, sprite_cache_size, atlas_class=SpriteAtlas, fade_class=BlitFade):
+        from concurrent.futures import ThreadPoolExecutor
+
+        self.spread = atlas_class.SPREAD
+        self.tiles = []
+        for rect in rects:
+            rect = pygame.Rect(rect).clip(surface.get_rect())
+            self.tiles.append((rect, surface.subsurface(rect), fade_class(rect.size, trail_alpha),
+                               atlas_class(sprite_cache_size)))
+        self.pool = ThreadPoolExecutor(len(self.tiles), thread_name_prefix="render-tile")
+
+    @staticmethod
+    def strips(width, height, count):
+        bounds = np.linspace(0, width, count + 1).astype(int).tolist()
+        return [pygame.Rect(lo, 0, hi - lo, height) for lo, hi in zip(bounds[:-1], bounds[1:])]
+
+    @staticmethod
+    def _fade_tile(tile, fade_steps):
+        fade, target = tile[2], tile[1]
+        for _ in range(fade_steps):
+            fade.apply(target)
+
+    @staticmethod
+    def _draw_tile(tile, xs, ys, rs, gs, bs, radii):
+        rect, target, _, atlas = tile
+        atlas.draw(target, xs - rect.left, ys - rect.top, rs, gs, bs, radii)
+
+    def render(self, particles, alpha=1.0, fade_steps=1):
+        # A PixelFade locks the whole screen, not just its subsurface, and a
+        # locked surface can't be blitted to, so every tile finishes fading
+        # before any tile draws
+        for job in [self.pool.submit(self._fade_tile, tile, fade_steps) for tile in self.tiles]:
+            job.result()
+        xs, ys, rs, gs, bs, radii = particles.sprites(alpha)
+        reach = radii * self.spread
+        jobs = []
+        for tile in self.tiles:
+            rect = tile[0]
+            inside = ((xs + reach > rect.left) & (xs - reach < rect.right)
+                      & (ys + reach > rect.top) & (ys - reach < rect.bottom))
+            jobs.append(self.pool.submit(self._draw_tile, tile, xs[inside], ys[inside],
+                                         rs[inside], gs[inside], bs[inside], radii[inside]))
+        for job in jobs:
+            job.result()
+
+    def close(self):
+        self.pool.shutdown()
+
+
+class FontCache:
+    """Creates fonts on first use instead of at startup.
+
+    pygame.font.SysFont scans every installed font the first time it runs.
+    The font file each (name, bold) resolves to is saved in font_index.json,
+    so later runs open the file directly and never scan."""
+
+    def __init__(self, index_path, persist=True):
+        self.index_path = index_path
+        self.persist = persist
+        self.fonts = {}
+        self.index = None
+
+    def _load_index(self):
+        try:
+            with open(self.index_path, 'r') as f:
+                self.index = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            self.index = {}
+
+    def _save_index(self):
+        try:
+            if not os.path.exists(CONFIG_DIR):
+                os.makedirs(CONFIG_DIR)
+            with open(self.index_path, 'w') as f:
+                json.dump(self.index, f, indent=4)
+        except OSError:
+            pass
+
+    def _resolve(self, name, bold):
+        if self.index is None:
+            self._load_index()
+        key = f"{name.lower()}|{'bold' if bold else 'regular'}"
+        if key in self.index:
+            path = self.index[key]
+            if path is None or os.path.exists(path):
+                return path
+        path = pygame.font.match_font(name, bold=bold)
+        self.index[key] = path
+        if self.persist:
+            self._save_index()
+        return path
+
+    def get(self, role):
+        font = self.fonts.get(role)
+        if font is None:
+            name, size, bold = FONT_SPECS[role]
+            path = self._resolve(name, bold)
+            font = pygame.font.Font(path, size)
+            if bold and path is None:
+                font.set_bold(True)
+            self.fonts[role] = font
+        return font
+
+
+class GlyphAtlas:
+    """Pre-rendered glyphs for one font and colour, for numbers that change
+    every frame (the 0.1 s safe timer)."""
+
+    def __init__(self, font, color, chars="0123456789.-"):
+        self.glyphs = {ch: font.render(ch, True, color) for ch in chars}
+
+    def width(self, text):
+        return sum(self.glyphs[ch].get_width() for ch in text)
+
+    def layout(self, text, x, y):
+        out = []
+        for ch in text:
+            glyph = self.glyphs[ch]
+            out.append((glyph, (x, y)))
+            x += glyph.get_width()
+        return out
+
+
+class HudRenderer:
+    """HUD text that only renders when it changes.
+
+    label() keeps one surface per slot and re-renders it only when the text
+    changes. number() splits a "prefix + digits + suffix" readout so the
+    static parts come from label() and the digits from a GlyphAtlas."""
+
+    def __init__(self):
+        self.labels = {}
+        self.atlases = {}
+
+    def label(self, key, text, font, color):
+        cached = self.labels.get(key)
+        if cached is None or cached[0] != text:
+            cached = (text, font.render(text, True, color))
+            self.labels[key] = cached
+        return cached[1]
+
+    def blit_label(self, surface, key, text, font, color, x, y, align_right=False):
+        label = self.label(key, text, font, color)
+        if align_right:
+            x -= label.get_width()
+        return surface.blit(label, (x, y))
+
+    def blit_number(self, surface, key, prefix, digits, suffix, font, color, right, y):
+        atlas = self.atlases.get((key, color))
+        if atlas is None:
+            atlas = self.atlases[(key, color)] = GlyphAtlas(font, color)
+        head = self.label((key, "prefix"), prefix, font, color)
+        tail = self.label((key, "suffix"), suffix, font, color)
+        x = right - head.get_width() - atlas.width(digits) - tail.get_width()
+        batch = [(head, (x, y))]
+        batch += atlas.layout(digits, x + head.get_width(), y)
+        batch.append((tail, (right - tail.get_width(), y)))
+        rects = surface.blits(batch)
+        return rects[0].unionall(rects[1:])
+
+
+class FrameProfiler:
+    """Per-stage timings for the last N frames, shown with F3 and dumped to
+    CSV with F4.
+
+    lap(stage) charges the time since the previous lap to that stage, so
+    stages that run once per simulation step add up across catch-up steps.
+    "idle" is the time spent waiting in clock.tick() and is not counted as
+    work."""
+
+    STAGES = ("events", "afk", "idle", "auto_launch", "particles", "fireworks", "cull",
+              "fade", "draw", "hud", "display")
+    GRAPH_W = 240
+    GRAPH_H = 60
+    GRAPH_MS = 33.3
+
+    def __init__(self, history=600):
+        self.frames = deque(maxlen=history)
+        # Keeps counting once the history is full, unlike len(self.frames)
+        self.frame_count = 0
+        self.visible = False
+        self.current = None
+        self.lines = []
+        self._last = 0.0
+
+    def begin_frame(self):
+        self.current = dict.fromkeys(self.STAGES, 0.0)
+        self._last = time.perf_counter()
+
+    def lap(self, stage):
+        if self.current is None:
+            return
+        now = time.perf_counter()
+        self.current[stage] += (now - self._last) * 1000.0
+        self._last = now
+
+    def end_frame(self):
+        if self.current is not None:
+            self.frames.append(self.current)
+            self.frame_count += 1
+            self.current = None
+
+    @staticmethod
+    def work_ms(frame):
+        return sum(ms for stage, ms in frame.items() if stage != "idle")
+
+    def summary(self, window=60):
+        recent = list(self.frames)[-window:]
+        if not recent:
+            return {}
+        return {stage: (sum(f[stage] for f in recent) / len(recent), max(f[stage] for f in recent))
+                for stage in self.STAGES}
+
+    def dump_csv(self, path):
+        try:
+            directory = os.path.dirname(path)
+            if directory and not os.path.exists(directory):
+                os.makedirs(directory)
+            with open(path, 'w') as f:
+                f.write(",".join(("frame",) + self.STAGES + ("work_ms",)) + "\n")
+                for i, frame in enumerate(self.frames):
+                    values = [f"{frame[stage]:.4f}" for stage in self.STAGES]
+                    f.write(",".join([str(i)] + values + [f"{self.work_ms(frame):.4f}"]) + "\n")
+        except OSError as e:
+            print(f"Trace error: {e}")
+
+    def draw(self, surface, hud, font, type_counts, firework_count, x, y):
+        rects = []
+        # Refresh the numbers twice a second so they're readable
+        if not self.lines or self.frame_count % 30 == 0:
+            self.lines = [f"{stage:<12}{avg:6.2f} avg {peak:6.2f} max" for stage, (avg, peak) in self.summary().items()]
+            counts = "  ".join(f"{name}:{count}" for name, count in zip(TYPE_NAMES, type_counts) if name != "pusher")
+            self.lines.append(f"fireworks:{firework_count}  {counts}")
+        line_h = font.get_linesize()
+        for i, line in enumerate(self.lines):
+            rects.append(hud.blit_label(surface, ("profiler", i), line, font, (200, 200, 200), x, y + i * line_h))
+
+        gy = y + len(self.lines) * line_h + 6
+        panel = pygame.Rect(x, gy, self.GRAPH_W, self.GRAPH_H)
+        surface.fill((20, 20, 20), panel)
+        budget_y = panel.bottom - int(self.GRAPH_H * (1000.0 / FPS) / self.GRAPH_MS)
+        pygame.draw.line(surface, (90, 90, 0), (panel.left, budget_y), (panel.right - 1, budget_y))
+        recent = list(self.frames)[-self.GRAPH_W:]
+        if len(recent) > 1:
+            points = [(panel.left + i, panel.bottom - 1 - int(min(self.work_ms(f), self.GRAPH_MS) / self.GRAPH_MS * (self.GRAPH_H - 1)))
+                      for i, f in enumerate(recent)]
+            pygame.draw.lines(surface, (0, 220, 120), False, points)
+        rects.append(panel)
+        return rects
+
+
+class FireworkBudget:
+    """Caps how many fireworks are in flight at once.
+
+    update_fireworks() resets the room from the real list length every step;
+    every launch (keys, auto-launch, clusters, special chasers) asks take()
+    first, since a Firework claims its particle row when it is built."""
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.room = limit
+
+    def reset(self, in_flight):
+        self.room = max(0, self.limit - in_flight)
+
+    def take(self, n=1):
+        granted = min(n, self.room)
+        self.room -= granted
+        return granted
+
+
+class QualityGovernor:
+    """Scales spark counts, trail density and the auto-launch rate to keep
+    update+draw time under a target.
+
+    Frame time is smoothed with an EMA. Quality drops quickly when over
+    budget and climbs back slowly with headroom, with a cooldown between
+    changes so it doesn't oscillate."""
+
+    MIN_LEVEL = 0.2
+
+    def __init__(self, target_ms, enabled=True):
+        self.target_ms = target_ms
+        self.enabled = enabled
+        self.level = 1.0
+        self.avg_ms = 0.0
+        self.cooldown = 0
+
+    def record(self, frame_ms):
+        if not self.enabled:
+            return
+        self.avg_ms += (frame_ms - self.avg_ms) * 0.1
+        if self.cooldown > 0:
+            self.cooldown -= 1
+            return
+        if self.avg_ms > self.target_ms:
+            self.level = max(self.MIN_LEVEL, self.level - 0.1)
+            self.cooldown = 10
+        elif self.avg_ms < self.target_ms * 0.7 and self.level < 1.0:
+            self.level = min(1.0, self.level + 0.05)
+            self.cooldown = 30
+
+    def sparks(self, amount):
+        return max(1, int(amount * self.level))
+
+    def trail_interval(self):
+        # Every 2nd step at full quality, down to every 10th
+        return min(10, int(round(2 / self.level)))
+
+    def launch_odds(self):
+        # 1-in-30 per step at full quality
+        return int(round(30 / self.level))
+
+
+fonts = FontCache(FONT_INDEX_PATH, persist=not BENCHMARK_MODE)
+# A replay trace covers the whole session, not just the last few seconds
+profiler = FrameProfiler(max(PROFILER_HISTORY, len(replay_session.frames)) if REPLAY_MODE else PROFILER_HISTORY)
+mark_startup("simulation_setup")
+governor = QualityGovernor(TARGET_FRAME_MS, ADAPTIVE_QUALITY)
+
+
+class Firework:
+    def __init__(self, world, x=None, y=None, p_type=TYPE_ROCKET):
+        self.world = world
+        particles = world.particles
+        rand = world.random
+        width, height = world.width, world.height
+        self.uid = next(world.firework_ids)
+        self.color = random_color(rand)
+        self.exploded = False
+        self.p_type = p_type
+        
+        if self.p_type == TYPE_CLUSTER:
+            self.fuse = rand.randint(20, 50)
+            self.is_special = False
+            angle = rand.uniform(math.pi + 0.5, 2 * math.pi - 0.5) 
+            speed = rand.uniform(6, 14)
+            vx = math.cos(angle) * speed
+            vy = math.sin(angle) * speed
+            self.rocket = particles.spawn(x, y, self.color, TYPE_CLUSTER, vx=vx, vy=vy, owner=self.uid)
+            
+        elif self.p_type == TYPE_CHASER:
+            self.fuse = 99999 
+            self.is_special = (rand.randint(1, 25) == 1) # 4% Chance
+            
+            if x is not None and y is not None:
+                start_x, start_y = x, y
+                angle = rand.uniform(0, 2 * math.pi)
+                speed = rand.uniform(6, 15) 
+                start_vx = math.cos(angle) * speed
+                start_vy = math.sin(angle) * speed
+            else:
+                start_vx = 0
+                start_vy = 0
+                side = rand.randint(0, 3)
+                if side == 0: 
+                    start_x = rand.randint(0, width)
+                    start_y = -10
+                elif side == 1: 
+                    start_x = rand.randint(0, width)
+                    start_y = height + 10
+                elif side == 2: 
+                    start_x = -10
+                    start_y = rand.randint(0, height)
+                elif side == 3: 
+                    start_x = width + 10
+                    start_y = rand.randint(0, height)
+
+            self.rocket = particles.spawn(start_x, start_y, self.color, TYPE_CHASER, vx=start_vx, vy=start_vy, owner=self.uid)
+            
+        else:
+            self.fuse = rand.randint(30, 70)
+            self.is_special = (rand.randint(1, 5) == 1)
+            start_x = rand.randint(100, width - 100)
+            start_y = height
+            launch_power = -1 * ((height / 3) / 45) - rand.uniform(3, 6)
+            start_vx = rand.uniform(-1, 1)
+            self.rocket = particles.spawn(start_x, start_y, self.color, TYPE_ROCKET, vx=start_vx, vy=launch_power, owner=self.uid)
+
+        self.age = 0
+        
+        # Pool full and refusing spawns: this firework is a dud
+        if self.rocket < 0:
+            self.exploded = True
+
+    def update(self, frame_input):
+        # Movement happens in particles.update(); this only handles spawning
+        new_borns = []
+        
+        if not self.exploded:
+            particles = self.world.particles
+            rand = self.world.random
+            self.age += 1
+            rocket_x = float(particles.x[self.rocket])
+            rocket_y = float(particles.y[self.rocket])
+            
+            if self.p_type == TYPE_CHASER:
+                if self.age % self.world.governor.trail_interval() == 0: 
+                    particles.spawn(rocket_x, rocket_y, self.color, TYPE_TRAIL,
+                                    vx=rand.uniform(-1, 1), vy=rand.uniform(0, 2), owner=self.uid)
+
+                caught = self.rocket in particles.chasers_at_mouse
+                
+                # Minimum Flight Time Check
+                if particles.fuel[self.rocket] <= 0 or (caught and self.age > 30):
+                    new_borns = self.explode(frame_input)
+            else:
+                if rocket_y < -ROCKET_VANISH_HEIGHT and particles.vy[self.rocket] < 0:
+                    self.fizzle()
+                elif self.age >= self.fuse or rocket_y > self.world.height:
+                    new_borns = self.explode(frame_input)
+
+        return new_borns
+
+    def fizzle(self):
+        # Flew off the top: nothing it spawns could be seen, so skip the burst
+        self.exploded = True
+        self.world.particles.kill(self.rocket)
+
+    def explode(self, frame_input):
+        world = self.world
+        particles = world.particles
+        rand = world.random
+        self.exploded = True
+        new_fireworks = []
+        rocket_x = float(particles.x[self.rocket])
+        rocket_y = float(particles.y[self.rocket])
+        particles.kill(self.rocket)
+        
+        if self.is_special and self.p_type == TYPE_ROCKET:
+            amount = world.budget.take(rand.randint(8, 15))
+            for _ in range(amount):
+                baby = Firework(world, rocket_x, rocket_y, p_type=TYPE_CLUSTER)
+                new_fireworks.append(baby)
+        else:
+            mx, my = frame_input.pos
+            dx = mx - rocket_x
+            dy = my - rocket_y
+            dist = math.hypot(dx, dy)
+            if dist < 1: dist = 1
+            dir_x = dx / dist
+            dir_y = dy / dist
+            
+            def create_pusher():
+                force = world.pusher_force
+                if self.p_type == TYPE_CLUSTER:
+                    force = force / 5
+                
+                force_magnitude = force / (dist + 20)
+                push_vx = dir_x * force_magnitude
+                push_vy = dir_y * force_magnitude
+                particles.spawn(0, 0, self.color, TYPE_CURSOR_PUSHER, vx=push_vx, vy=push_vy,
+                                owner=self.uid, source_type=self.p_type)
+
+            if self.p_type == TYPE_CHASER:
+                # INCREMENT SCORE
+                world.chaser_score += 1
+                
+                if self.is_special:
+                    for _ in range(world.budget.take(3)):
+                        new_fireworks.append(Firework(world, rocket_x, rocket_y, p_type=TYPE_CHASER))
+
+                if world.pusher_enabled:
+                    create_pusher()
+                
+                amount = world.governor.sparks(rand.randint(world.sparks_chaser_max // 2, world.sparks_chaser_max))
+                particles.spawn_burst(amount, rocket_x, rocket_y, self.color, owner=self.uid)
+
+            else:
+                amount = world.governor.sparks(rand.randint(world.sparks_rocket_max // 2, world.sparks_rocket_max))
+                if world.punishment_mode and world.pusher_enabled:
+                    create_pusher()
+
+            shape = rand.choice(world.burst_shapes) if self.p_type != TYPE_CHASER else "sphere"
+            particles.spawn_burst(amount, rocket_x, rocket_y, self.color, owner=self.uid, shape=shape)
+                
+        return new_fireworks
+
+    def is_finished(self):
+        return self.exploded and self.uid not in self.world.particles.owner_live
+
+# --- Simulation World ---
+
+def _no_lap(stage):
+    pass
+
+class World:
+    """One self-contained simulation: screen size, physics settings, score
+    state, both RNGs, the particle store and the fireworks in flight.
+
+    Nothing here opens a display or reads argv, so a World can be built from
+    an import, and several can run side by side. step() advances one SIM_DT
+    step given the frame's InputState; drawing stays in the front end.
+
+    on_hit, if set, is called with the world when a pusher hits the cursor,
+    before the timer (and, for chaser pushers, the score) is reset."""
+
+    def __init__(self, width, height, config=None, seed=None, workers=0, governor=None, profiler=None):
+        config = DEFAULT_CONFIG if config is None else config
+        self.width = width
+        self.height = height
+        self.seed = seed
+        self.random = random.Random(seed)
+        self.rng = np.random.default_rng(seed)
+
+        self.gravity = config.get("gravity", 0.05)
+        self.wind = config.get("wind", 0)
+        self.pusher_enabled = config.get("cursor_pusher_enabled", True)
+        self.pusher_force = config.get("pusher_force", 1000)
+        self.sparks_chaser_max = config.get("sparks_chaser", 200)
+        self.sparks_rocket_max = config.get("sparks_rocket", 100)
+        self.punishment_mode = config.get("punishment_mode", False)
+        self.burst_shapes = [s for s in config.get("burst_shapes", ["sphere"]) if s in BURST_SHAPES] or ["sphere"]
+
+        # Without a governor from the front end, run at a fixed full quality
+        self.governor = governor if governor is not None else QualityGovernor(TARGET_FRAME_MS, enabled=False)
+        self.budget = FireworkBudget(config.get("max_fireworks", 300))
+        self.particles = ParticleStore(self, config.get("particle_pool_size", 20000),
+                                       config.get("particle_pool_policy", "drop_dimmest"), workers)
+        self.fireworks = []
+        self.firework_ids = itertools.count()
+        self.last_hit_time = 0
+        self.chaser_score = 0
+        self.on_hit = None
+        self.lap = profiler.lap if profiler is not None else _no_lap
+
+    def launch(self, p_type=TYPE_ROCKET, count=1):
+        """Launch up to count fireworks, as many as the budget allows."""
+        launched = [Firework(self, p_type=p_type) for _ in range(self.budget.take(count))]
+        self.fireworks.extend(launched)
+        return launched
+
+    def register_hit(self, source_type, ticks):
+        if self.on_hit is not None:
+            self.on_hit(self)
+        # Always reset the timer on a physical hit; the score only for chasers
+        self.last_hit_time = ticks
+        if source_type == TYPE_CHASER:
+            self.chaser_score = 0
+
+    def auto_launch(self):
+        if self.random.randint(1, self.governor.launch_odds()) == 1:
+            if self.random.randint(1, 10) == 1:
+                self.launch(TYPE_CHASER)
+            else:
+                self.launch(TYPE_ROCKET)
+
+    def step(self, frame_input):
+        self.auto_launch()
+        self.lap("auto_launch")
+
+        self.budget.reset(len(self.fireworks))
+        self.particles.update(frame_input)
+        self.lap("particles")
+
+        new_additions = []
+        for fw in self.fireworks[:]:
+            babies = fw.update(frame_input)
+            if babies:
+                new_additions.extend(babies)
+        self.fireworks.extend(new_additions)
+        self.lap("fireworks")
+        self.fireworks = [fw for fw in self.fireworks if not fw.is_finished()]
+        self.lap("cull")
+
+    def close(self):
+        self.particles.close()
+
+# --- Main Loop ---
+
+def main(replay=None):
+    global mouse
+
+    # Seed the world so a recorded session can be replayed exactly
+    if replay is not None:
+        seed = replay.seed
+        start_ticks = replay.start_ticks
+        mouse = ScriptedMouse(replay.frames[0][3:5] if replay.frames else (0, 0))
+        governor.enabled = False
+        replay_frames = iter(replay.frames)
+    else:
+        seed = int.from_bytes(os.urandom(8), "little")
+        start_ticks = pygame.time.get_ticks()
+    world = World(WIDTH, HEIGHT, active_config, seed, SIM_WORKERS, governor, profiler)
+    world.on_hit = check_and_save_high_scores
+    # The AFK teleport isn't recorded, so a replay has to draw the same targets
+    afk_random = random.Random(seed)
+    recorder = None
+    if RECORD_SESSION:
+        stamp = time.strftime("%Y%m%d-%H%M%S")
+        recorder = SessionRecording(seed, WIDTH, HEIGHT, start_ticks, active_config)
+        try:
+            if not os.path.exists(CONFIG_DIR):
+                os.makedirs(CONFIG_DIR)
+            recorder.start(os.path.join(CONFIG_DIR, f"session-{stamp}.fwrec"))
+        except OSError as e:
+            print(f"Recording error: {e}")
+            recorder = None
+    
+    # Init Mouse State for AFK Tracking. Starts from the first frame's
+    # captured cursor: before the first event pump SDL may still report
+    # (0, 0), and a replay has no position from before frame 0.
+    last_mouse_pos = None
+    last_move_time = start_ticks
+    
+    world.last_hit_time = start_ticks
+
+    atlas_class = SPRITE_STYLES.get(SPARK_STYLE, SpriteAtlas)
+    atlas = atlas_class(SPRITE_CACHE_SIZE)
+    fade_class = TRAIL_FADES.get(TRAIL_FADE, BlitFade)
+    hud = HudRenderer()
+
+    # Tiles do their own fading and drawing at full resolution; they replace
+    # dirty rects and render scaling. Dirty rects also need full resolution.
+    tiles = None
+    dirty = None
+    target = None
+    bounds = None
+    if RENDER_TILES:
+        if RENDER_TILES == "monitors":
+            # A replay of a multi-monitor session gets one tile per screen
+            rects = tile_rects or [screen.get_rect()]
+        else:
+            rects = TiledRenderer.strips(WIDTH, HEIGHT, int(RENDER_TILES))
+        tiles = TiledRenderer(screen, rects, TRAIL_ALPHA, SPRITE_CACHE_SIZE, atlas_class, fade_class)
+    elif RENDER_MODE == RENDER_DIRTY:
+        target = ScaledTarget(screen, 1.0, TRAIL_ALPHA, fade_class=fade_class)
+        dirty = DirtyTiles(WIDTH, HEIGHT, target.fade)
+        screen.fill(BLACK)
+        pygame.display.flip()
+    else:
+        auto_scale = RENDER_SCALE == "auto"
+        target = ScaledTarget(screen, 1.0 if auto_scale else float(RENDER_SCALE), TRAIL_ALPHA,
+                              RENDER_SMOOTH, auto_scale, TARGET_FRAME_MS / 2, fade_class)
+        if TRAIL_FADE_BOUNDS:
+            bounds = FadeBounds(measure_fade_frames(target.fade))
+            bounds_scale = target.scale
+
+    # Fixed-timestep accumulator: physics always advances in SIM_DT steps,
+    # rendering happens as often as MAX_FPS allows and interpolates between.
+    accumulator = 0.0
+    clock.tick()
+    first_frame = True
+    replay_start = time.perf_counter()
+    peak_particles = 0
+
+    running = True
+    while running:
+        profiler.begin_frame()
+        if replay is not None:
+            frame = next(replay_frames, None)
+            if frame is None:
+                break
+            ticks, replay_steps, governor.level, mouse_x, mouse_y, packed_events = frame
+            mouse.pos = (mouse_x, mouse_y)
+            events = SessionRecording.to_pygame_events(packed_events)
+            pygame.event.pump()
+        else:
+            events = pygame.event.get()
+            ticks = pygame.time.get_ticks()
+
+        for event in events:
+            if event.type == pygame.QUIT:
+                check_and_save_high_scores(world) 
+                running = False
+            
+            if event.type == pygame.MOUSEBUTTONDOWN:
+                check_and_save_high_scores(world) 
+                running = False
+                
+            if event.type == pygame.KEYDOWN:
+                if event.key in [pygame.K_q, pygame.K_ESCAPE]:
+                    check_and_save_high_scores(world) 
+                    running = False
+                
+                if event.key == pygame.K_SPACE:
+                    world.launch(TYPE_ROCKET)
+                if event.key == pygame.K_c:
+                    world.launch(TYPE_CHASER)
+                if event.key == pygame.K_BACKSLASH:
+                    world.launch(TYPE_ROCKET, 10)
+                if event.key == pygame.K_F12:
+                    world.launch(TYPE_ROCKET, 30)
+                
+                if event.key == pygame.K_RIGHT:
+                    world.wind += 1
+                if event.key == pygame.K_LEFT:
+                    world.wind -= 1
+
+                if event.key == pygame.K_F3:
+                    profiler.visible = not profiler.visible
+                if event.key == pygame.K_F4:
+                    profiler.dump_csv(os.path.join(CONFIG_DIR, "frame_trace.csv"))
+
+        frame_input = InputState(mouse.get_pos(), ticks, mouse)
+        captured_pos = frame_input.pos
+        profiler.lap("events")
+
+        # --- AFK / IDLE LOGIC ---
+        mx, my = frame_input.pos
+        if last_mouse_pos is None:
+            last_mouse_pos = (mx, my)
+            last_move_time = ticks
+        dist_moved = math.hypot(mx - last_mouse_pos[0], my - last_mouse_pos[1])
+        
+        # If moved significantly (>3px), reset idle timer
+        if dist_moved > 3:
+            last_mouse_pos = (mx, my)
+            last_move_time = ticks
+            
+        # Check if idle for > 30 seconds
+        if ticks - last_move_time > 30000:
+            # Teleport!
+            new_x = afk_random.randint(50, WIDTH - 50)
+            new_y = afk_random.randint(50, HEIGHT - 50)
+            mouse.set_pos(new_x, new_y)
+            frame_input.mouse_x, frame_input.mouse_y = new_x, new_y
+            
+            # Reset trackers to the new position so we don't loop teleport
+            last_mouse_pos = (new_x, new_y)
+            last_move_time = ticks
+
+        profiler.lap("afk")
+
+        if replay is not None:
+            # Replays reuse the recorded step counts; headless ones don't wait
+            if not replay_args.headless:
+                clock.tick(MAX_FPS)
+            target_steps = replay_steps
+            alpha = 1.0
+        else:
+            accumulator += clock.tick(MAX_FPS) / 1000.0
+            target_steps = min(int(accumulator / SIM_DT), MAX_CATCHUP_STEPS)
+        profiler.lap("idle")
+        if recorder is not None:
+            recorder.record_frame(ticks, target_steps, governor.level, captured_pos, events)
+        work_start = time.perf_counter()
+        steps = 0
+        while steps < target_steps:
+            world.step(frame_input)
+            steps += 1
+        frame_input.commit(world.width, world.height)
+        peak_particles = max(peak_particles, world.particles.live)
+        if replay is None:
+            accumulator -= steps * SIM_DT
+            if steps == MAX_CATCHUP_STEPS:
+                # Overloaded: drop the backlog and run slow rather than spiral
+                accumulator %= SIM_DT
+            alpha = accumulator / SIM_DT
+
+        # Draw Trail (fade once per simulation step so trail length doesn't
+        # depend on the refresh rate)
+        fade_rects = []
+        if tiles is not None:
+            # Fading happens per tile on the render threads, counted as draw
+            profiler.lap("fade")
+            tiles.render(world.particles, alpha, steps)
+            profiler.lap("draw")
+        else:
+            render_start = time.perf_counter()
+            for _ in range(steps):
+                if dirty is not None:
+                    step_rects = dirty.rects()
+                    for rect in step_rects:
+                        target.fade.apply(screen, rect)
+                    fade_rects.extend(step_rects)
+                    dirty.age()
+                elif bounds is not None:
+                    rect = bounds.rect()
+                    if rect is not None:
+                        target.fade.apply(target.surface, rect)
+                    bounds.age()
+                else:
+                    target.fade.apply(target.surface)
+            profiler.lap("fade")
+
+            world.particles.draw(target.surface, atlas, alpha, target.scale)
+            if bounds is not None:
+                if target.scale != bounds_scale:
+                    # The rescaled trails can be anywhere on the new surface
+                    bounds.mark(target.surface.get_rect())
+                    bounds_scale = target.scale
+                _, xs, ys = world.particles.positions(alpha)
+                bounds.mark_points(xs * target.scale, ys * target.scale, int(7 * atlas.SPREAD * target.scale) + 1)
+            target.present()
+            target.record((time.perf_counter() - render_start) * 1000.0)
+            profiler.lap("draw")
+        hud_rects = []
+
+        # --- UI OVERLAYS ---
+        
+        # 1. Wind
+        if world.wind != 0:
+            hud_rects.append(hud.blit_label(screen, "wind", f"Wind: {world.wind}", fonts.get("wind"), (255, 255, 255), 20, 20))
+
+        # 2. Survival Timer & Score (Not in Punishment Mode)
+        if not world.punishment_mode:
+            current_time = ticks
+            elapsed_seconds = (current_time - world.last_hit_time) / 1000.0
+            
+            # Show timer if safe for > 30s
+            if elapsed_seconds > 30:
+                hud_rects.append(hud.blit_number(screen, "safe_time", "Safe Time: ", f"{elapsed_seconds:.1f}", "s",
+                                                 fonts.get("timer"), (0, 255, 0), WIDTH - 20, 20)) # Green text
+                
+                # Show Best Time
+                best_time = active_config.get("high_score_time", 0.0)
+                hud_rects.append(hud.blit_label(screen, "best_time", f"Best: {best_time}s", fonts.get("small"), (100, 100, 100),
+                                                WIDTH - 20, 55, align_right=True))
+            
+            # Show score if > 0
+            if world.chaser_score > 0:
+                y_pos = 80 if elapsed_seconds > 30 else 20
+                hud_rects.append(hud.blit_label(screen, "score", f"Chasers Survived: {world.chaser_score}", fonts.get("score"), (255, 50, 50),
+                                                WIDTH - 20, y_pos, align_right=True)) # Red text
+                
+                # Show Best Score
+                best_score = active_config.get("high_score_chasers", 0)
+                hud_rects.append(hud.blit_label(screen, "best_score", f"Best: {best_score}", fonts.get("small"), (100, 100, 100),
+                                                WIDTH - 20, y_pos + 35, align_right=True))
+
+        # 3. Quality Level
+        if SHOW_QUALITY_OVERLAY:
+            quality_str = f"Quality: {governor.level * 100:.0f}% ({governor.avg_ms:.1f}ms)"
+            if target is not None and target.scale < 1.0:
+                quality_str += f"  Render scale: {target.scale:g}"
+            small_font = fonts.get("small")
+            hud_rects.append(hud.blit_label(screen, "quality", quality_str, small_font, (100, 100, 100),
+                                            20, HEIGHT - small_font.get_height() - 20))
+
+        # 4. Frame Profiler (F3)
+        if profiler.visible:
+            particles = world.particles
+            n = particles.count
+            type_counts = np.bincount(particles.type[:n][particles.alive[:n]], minlength=len(TYPE_NAMES)).tolist()
+            hud_rects.extend(profiler.draw(screen, hud, fonts.get("small"), type_counts, len(world.fireworks), 20, 60))
+        profiler.lap("hud")
+
+        if bounds is not None and target.surface is screen:
+            # The HUD is drawn onto the trails and has to fade out with them
+            for rect in hud_rects:
+                bounds.mark(rect)
+        if dirty is None:
+            pygame.display.flip()
+        else:
+            _, xs, ys = world.particles.positions(alpha)
+            dirty.mark_points(xs, ys, pad=7 * atlas.SPREAD)
+            for rect in hud_rects:
+                dirty.mark_rect(rect)
+            pygame.display.update(fade_rects + dirty.rects())
+        profiler.lap("display")
+        profiler.end_frame()
+        governor.record((time.perf_counter() - work_start) * 1000.0)
+
+        if first_frame:
+            first_frame = False
+            mark_startup("first_frame")
+            if STARTUP_REPORT:
+                save_startup_report()
+
+    if recorder is not None:
+        recorder.close()
+    if replay is not None and profiler.frames:
+        work = sorted(profiler.work_ms(f) for f in profiler.frames)
+        print(json.dumps({
+            "session": replay_args.session,
+            "frames": len(work),
+            "wall_s": round(time.perf_counter() - replay_start, 3),
+            "work_ms": {"mean": round(sum(work) / max(len(work), 1), 3),
+                        "p50": round(percentile(work, 50), 3),
+                        "p99": round(percentile(work, 99), 3),
+                        "max": round(work[-1], 3)},
+            "peak_particles": peak_particles,
+        }, indent=2))
+        if replay_args.trace:
+            profiler.dump_csv(replay_args.trace)
+
+    if tiles is not None:
+        tiles.close()
+    world.close()
+    config_writer.close()
+    pygame.quit()
+
+# --- Benchmark ---
+
+class ScriptedMouse:
+    """Stands in for pygame.mouse during benchmarks. The script sets the
+    position each frame; pushers can still shove it within a frame."""
+
+    def __init__(self, pos):
+        self.pos = pos
+
+    def get_pos(self):
+        return self.pos
+
+    def set_pos(self, x, y=None):
+        if y is None:
+            x, y = x
+        self.pos = (int(x), int(y))
+
+def scripted_mouse_pos(scenario, frame):
+    if scenario == "idle":
+        return (WIDTH // 2, HEIGHT // 2)
+    # Slow Lissajous sweep so chasers keep chasing and sometimes catch it
+    return (int(WIDTH / 2 + WIDTH / 3 * math.sin(frame * 0.013)),
+            int(HEIGHT / 2 + HEIGHT / 3 * math.sin(frame * 0.021)))
+
+def scripted_launches(scenario, frame, world):
+    if scenario == "f12_burst":
+        if frame % 180 == 0:
+            world.launch(TYPE_ROCKET, 30)
+    elif scenario == "chaser_storm":
+        if frame % 60 == 0:
+            world.launch(TYPE_CHASER, 10)
+    elif scenario == "special_chain":
+        if frame % 120 == 0:
+            for fw in world.launch(TYPE_CHASER, 3):
+                fw.is_special = True
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))]
+
+def run_scenario(scenario, frames, seed, tiles=0, scale=1.0, style="flat", fade="blit"):
+    global mouse
+    # A fresh world per scenario; without a governor it runs at full quality,
+    # since timing-driven quality would make runs non-deterministic
+    world = World(WIDTH, HEIGHT, active_config, seed, SIM_WORKERS)
+    mouse = ScriptedMouse(scripted_mouse_pos(scenario, 0))
+
+    screen.fill(BLACK)
+    target = ScaledTarget(screen, scale, TRAIL_ALPHA, RENDER_SMOOTH, fade_class=TRAIL_FADES[fade])
+    atlas = SPRITE_STYLES[style](SPRITE_CACHE_SIZE)
+    # The same frames drawn again with tiles on threads, into a second surface
+    tiled = None
+    tiled_ms = []
+    if tiles:
+        tiled_surface = pygame.Surface((WIDTH, HEIGHT))
+        tiled = TiledRenderer(tiled_surface, TiledRenderer.strips(WIDTH, HEIGHT, tiles),
+                              TRAIL_ALPHA, SPRITE_CACHE_SIZE, SPRITE_STYLES[style], TRAIL_FADES[fade])
+
+    update_ms = []
+    draw_ms = []
+    peak_particles = 0
+    peak_fireworks = 0
+    for frame in range(frames):
+        mouse.pos = scripted_mouse_pos(scenario, frame)
+        frame_input = InputState.capture()
+
+        t0 = time.perf_counter()
+        scripted_launches(scenario, frame, world)
+        world.step(frame_input)
+        frame_input.commit(world.width, world.height)
+        t1 = time.perf_counter()
+        target.fade.apply(target.surface)
+        world.particles.draw(target.surface, atlas, scale=target.scale)
+        target.present()
+        pygame.display.flip()
+        t2 = time.perf_counter()
+        if tiled is not None:
+            tiled.render(world.particles)
+            tiled_ms.append((time.perf_counter() - t2) * 1000.0)
+
+        update_ms.append((t1 - t0) * 1000.0)
+        draw_ms.append((t2 - t1) * 1000.0)
+        peak_particles = max(peak_particles, world.particles.live)
+        peak_fireworks = max(peak_fireworks, len(world.fireworks))
+    world.close()
+
+    frame_ms = [u + d for u, d in zip(update_ms, draw_ms)]
+    result = {
+        "frames": frames,
+        "update_ms": {"mean": sum(update_ms) / frames, "p50": percentile(update_ms, 50), "p99": percentile(update_ms, 99)},
+        "draw_ms": {"mean": sum(draw_ms) / frames, "p50": percentile(draw_ms, 50), "p99": percentile(draw_ms, 99)},
+        "frame_ms": {"mean": sum(frame_ms) / frames, "p50": percentile(frame_ms, 50),
+                     "p99": percentile(frame_ms, 99), "max": max(frame_ms)},
+        "peak_particles": peak_particles,
+        "peak_fireworks": peak_fireworks,
+        "per_frame": {"update_ms": [round(v, 4) for v in update_ms], "draw_ms": [round(v, 4) for v in draw_ms]},
+    }
+    if tiled is not None:
+        tiled.close()
+        result["tiled_draw_ms"] = {"tiles": tiles, "mean": sum(tiled_ms) / frames,
+                                   "p50": percentile(tiled_ms, 50), "p99": percentile(tiled_ms, 99)}
+        result["per_frame"]["tiled_draw_ms"] = [round(v, 4) for v in tiled_ms]
+    return result
+
+def run_fade_benchmark(frames, seed):
+    # Trail fade alone on a screen of noise, full screen and bounded to a
+    # box a quarter of the screen's area (a typical cluster of fireworks)
+    rng = np.random.default_rng(seed)
+    results = {}
+    for width, height in ((1920, 1080), (2560, 1440), (3840, 2160)):
+        noise = rng.integers(0, 256, (width, height, 3), dtype=np.uint8)
+        box = pygame.Rect(width // 4, height // 4, width // 2, height // 2)
+        size_result = {}
+        outputs = {}
+        for name, fade_class in TRAIL_FADES.items():
+            surface = pygame.Surface((width, height))
+            fade = fade_class((width, height), TRAIL_ALPHA)
+            for label, rect in (("full", None), ("bounded", box)):
+                pygame.surfarray.blit_array(surface, noise)
+                fade_ms = []
+                for _ in range(frames):
+                    start = time.perf_counter()
+                    fade.apply(surface, rect)
+                    fade_ms.append((time.perf_counter() - start) * 1000.0)
+                size_result[f"{name}_{label}_ms"] = {"mean": sum(fade_ms) / frames, "p50": percentile(fade_ms, 50)}
+            outputs[name] = pygame.surfarray.array3d(surface)
+        size_result["identical"] = bool(np.array_equal(outputs["blit"], outputs["pixels"]))
+        results[f"{width}x{height}"] = size_result
+    return results
+
+def run_benchmark(args):
+    if args.fade_bench:
+        report = {
+            "revision": os.path.basename(__file__),
+            "seed": args.seed,
+            "trail_alpha": TRAIL_ALPHA,
+            "fade": run_fade_benchmark(args.frames, args.seed),
+        }
+    else:
+        report = {
+            "revision": os.path.basename(__file__),
+            "seed": args.seed,
+            "size": [WIDTH, HEIGHT],
+            "workers": SIM_WORKERS,
+            "tiles": args.tiles,
+            "scale": args.scale,
+            "style": args.style,
+            "fade": args.fade,
+            "startup": startup_report(),
+            "scenarios": {name: run_scenario(name, args.frames, args.seed, args.tiles, args.scale, args.style,
+                                             args.fade)
+                          for name in args.scenarios},
+        }
+    text = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(text)
+    print(text)
+    pygame.quit()
+
+if __name__ == "__main__":
+    if BENCHMARK_MODE:
+        run_benchmark(benchmark_args)
+    elif REPLAY_MODE:
+        main(replay_session)
+    else:
+        main()
\ No newline at end of file